@@ -4,32 +4,70 @@ from flask_login import current_user, login_required
 from app import db
 from app.articles import bp, forms
 from app.decorators import own_article_required
-from app.models import Article
+from app.helpers.pagination import keyset_paginate
+from app.helpers.search import search_articles
+from app.helpers.templates import render_page
+from app.models import Article, ArticleData
+
+# the key of the articles' keywords in their data
+KEYWORD_KEY = "keyword"
 
 
 @bp.route("/")
 @login_required
 def articles():
     per_page = current_app.config["ARTICLES_PER_PAGE"]
-    page = request.args.get("page", 1, type=int)
-    pagination = Article.query.filter_by(user=current_user).paginate(
-        page=page, per_page=per_page
+    pagination = keyset_paginate(
+        # the table mustn't load anything per article (e.g., its data), that's
+        # what `_keywords_of` is for
+        db.select(Article)
+        .filter_by(user_id=current_user.id)
+        .options(db.raiseload("*")),
+        keys=(Article.created_at, Article.id),
+        per_page=per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
     )
     articles = pagination.items
-    return render_template(
+    return render_page(
         "articles/articles.html",
         articles=articles,
+        keywords=_keywords_of(articles),
         Article=Article,
         pagination=pagination,
     )
 
 
+@bp.route("/search")
+@login_required
+def search():
+    query = request.args.get("q", "").strip()
+    results = []
+    if query:
+        results = search_articles(
+            current_user.id, query, limit=current_app.config["ARTICLES_PER_PAGE"]
+        )
+    articles = {}
+    if results:
+        articles = {
+            article.id: article
+            for article in db.session.scalars(
+                db.select(Article).filter(
+                    Article.id.in_([result.article_id for result in results])
+                )
+            )
+        }
+    return render_page(
+        "articles/search.html", query=query, results=results, articles=articles
+    )
+
+
 @bp.route("/<slug>")
 @login_required
 @own_article_required("main.index")
 def article(slug):
     article = db.first_or_404(db.select(Article).filter_by(slug=slug))
-    return render_template("articles/article.html", article=article)
+    return render_page("articles/article.html", article=article)
 
 
 @bp.route("/new", methods=["get", "post"])
@@ -75,3 +113,31 @@ def delete_article(slug):
         return redirect(url_for("articles.articles"))
     flash("You can't delete articles that don't belong to you.")
     return redirect(url_for("articles.articles"))
+
+
+def _keywords_of(articles: list[Article]) -> dict[int, list[str]]:
+    """
+    Loads the keywords of the articles in a single query.
+
+    Args:
+        articles (list[Article]): The articles.
+
+    Returns:
+        dict[int, list[str]]: The keywords of each article, keyed by its id.
+        Articles without keywords are left out.
+    """
+    keywords = {}
+    if not articles:
+        return keywords
+    rows = db.session.execute(
+        db.select(Article.id, ArticleData.value)
+        .join(Article.data)
+        .filter(
+            Article.id.in_([article.id for article in articles]),
+            ArticleData.key == KEYWORD_KEY,
+        )
+        .order_by(ArticleData.id)
+    )
+    for article_id, value in rows:
+        keywords.setdefault(article_id, []).append(value)
+    return keywords
@@ -1,12 +1,44 @@
+import hashlib
+import threading
 import uuid
+from collections import OrderedDict
+from functools import lru_cache
 
 import mistune
 from pygments import highlight
 from pygments.formatters import html
+from pygments.lexer import Lexer
 from pygments.lexers import get_lexer_by_name
+from pygments.lexers.special import TextLexer
+from pygments.util import ClassNotFound
 from slugify import slugify
 
 
+# change this whenever the rendering of the articles changes, so the HTML that
+# was cached with the articles is rendered again
+RENDERER_VERSION = "1"
+MARKDOWN_PLUGINS = [
+    "abbr",
+    "def_list",
+    "footnotes",
+    # "insert",
+    # "mark",
+    # "math",
+    # "spoiler",
+    "strikethrough",
+    # "subscript",
+    # "superscript",
+    "table",
+    "task_lists",
+]
+# how many highlighted code blocks are kept around
+HIGHLIGHT_CACHE_SIZE = 1024
+
+# (language, stripall, digest of the code) -> highlighted code
+_highlighted: OrderedDict[tuple[str, bool, str], str] = OrderedDict()
+_highlighted_lock = threading.Lock()
+
+
 def generate_slug(text: str) -> str:
     """
     Generates a slug based on the given article title, using a combination of the
@@ -31,7 +63,104 @@ class HighlightRenderer(mistune.HTMLRenderer):
 
     def block_code(self, code, lang=None):
         if lang:
-            lexer = get_lexer_by_name(lang, stripall=True)
-            formatter = html.HtmlFormatter()
-            return highlight(code, lexer, formatter)
+            return highlight_code(code, lang, stripall=True)
         return "<pre><code>" + mistune.escape(code) + "</code></pre>"
+
+
+def highlight_code(code: str, lang: str, stripall: bool = False) -> str:
+    """
+    Highlights code as HTML. The most recently highlighted code blocks are
+    kept (by their language and digest), so the same code isn't highlighted
+    again. Code in a language Pygments doesn't know is kept as plain text.
+
+    Args:
+        code (str): The code to highlight.
+        lang (str): The language of the code.
+        stripall (bool, optional): Strip the leading and trailing whitespace
+        of the code. Defaults to False.
+
+    Returns:
+        str: The highlighted code.
+    """
+    key = (lang, stripall, hashlib.sha256(code.encode()).hexdigest())
+    with _highlighted_lock:
+        highlighted = _highlighted.get(key)
+        if highlighted is not None:
+            _highlighted.move_to_end(key)
+            return highlighted
+
+    highlighted = highlight(code, _lexer(lang, stripall), _formatter())
+    with _highlighted_lock:
+        _highlighted[key] = highlighted
+        if len(_highlighted) > HIGHLIGHT_CACHE_SIZE:
+            _highlighted.popitem(last=False)
+    return highlighted
+
+
+@lru_cache(maxsize=128)
+def _lexer(lang: str, stripall: bool) -> Lexer:
+    """Gets the lexer of a language, or a plain text one if there isn't one."""
+    try:
+        return get_lexer_by_name(lang, stripall=stripall)
+    except ClassNotFound:
+        return TextLexer(stripall=stripall)
+
+
+@lru_cache(maxsize=None)
+def _formatter() -> html.HtmlFormatter:
+    """Creates the formatter of highlighted code."""
+    return html.HtmlFormatter()
+
+
+@lru_cache(maxsize=None)
+def _markdown() -> mistune.Markdown:
+    """Creates the Markdown parser of the articles, once per process."""
+    return mistune.create_markdown(
+        renderer=HighlightRenderer(), plugins=MARKDOWN_PLUGINS
+    )
+
+
+def render_markdown(text: str) -> str:
+    """
+    Renders Markdown as HTML (with syntax highlighting for code blocks).
+
+    Args:
+        text (str): The Markdown.
+
+    Returns:
+        str: The HTML.
+    """
+    return _markdown()(text)
+
+
+def content_fingerprint(content: str) -> str:
+    """
+    Creates a fingerprint of an article's content and of the renderer, which
+    tells whether HTML rendered earlier is still current.
+
+    Args:
+        content (str): The content of the article.
+
+    Returns:
+        str: The fingerprint.
+    """
+    text = f"{RENDERER_VERSION}\n{content}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def current_html(content: str, html: str | None, fingerprint: str | None) -> str | None:
+    """
+    Gives the HTML cached with an article if it's current, that is, if it was
+    rendered from the article's content by this renderer.
+
+    Args:
+        content (str): The content of the article.
+        html (str | None): The cached HTML.
+        fingerprint (str | None): The fingerprint cached with the HTML.
+
+    Returns:
+        str | None: The HTML, or None if it isn't current.
+    """
+    if html is None or fingerprint != content_fingerprint(content or ""):
+        return None
+    return html
@@ -0,0 +1,125 @@
+"""
+Helper module for keyset (cursor-based) pagination.
+
+Instead of skipping the rows of the previous pages (OFFSET) and counting every
+row (COUNT(*)), a page starts right after (or before) the last row of the page
+the user came from, so every page costs the same as the first one, given an
+index on the keys.
+
+Classes:
+- KeysetPage: A page of items and the cursors of its neighbours.
+
+Functions:
+- keyset_paginate(query, keys, per_page, after, before) -> KeysetPage: Load a
+  page of the query's rows.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime as dt
+from typing import Any, NamedTuple
+
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app import db
+
+
+class KeysetPage(NamedTuple):
+    items: list
+    per_page: int
+    # the cursors to pass as `before` and `after` to get the previous and the
+    # next page, None if there isn't one
+    prev_cursor: str | None
+    next_cursor: str | None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def keyset_paginate(
+    query: db.Select,
+    keys: tuple[InstrumentedAttribute, ...],
+    per_page: int,
+    after: str = None,
+    before: str = None,
+) -> KeysetPage:
+    """
+    Loads a page of the query's rows, ordered by the keys (which have to
+    identify the rows, e.g., by ending with the primary key).
+
+    Args:
+        query (db.Select): The query of the rows (without an order).
+        keys (tuple[InstrumentedAttribute, ...]): The attributes to order the
+        rows by.
+        per_page (int): The number of rows in a page.
+        after (str, optional): The cursor of the row the page starts after.
+        Defaults to None.
+        before (str, optional): The cursor of the row the page ends before.
+        Defaults to None. If neither is given (or the cursor isn't valid), the
+        first page is loaded.
+
+    Returns:
+        KeysetPage: The page.
+    """
+    backwards = before is not None
+    values = _decode_cursor(before if backwards else after, keys)
+    if values is None:
+        backwards = False
+    else:
+        query = query.filter(_beyond(keys, values, backwards))
+
+    order = [key.desc() for key in keys] if backwards else list(keys)
+    # one more row tells if there's another page
+    items = db.session.scalars(query.order_by(*order).limit(per_page + 1)).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    has_prev = more if backwards else values is not None
+    has_next = True if backwards else more
+    return KeysetPage(
+        items=items,
+        per_page=per_page,
+        prev_cursor=_encode_cursor(items[0], keys) if has_prev and items else None,
+        next_cursor=_encode_cursor(items[-1], keys) if has_next and items else None,
+    )
+
+
+def _beyond(keys: tuple, values: list, backwards: bool):
+    """Filters the rows after (or before) the row with the values"""
+    criteria = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        equal = [k == v for k, v in zip(keys[:i], values[:i])]
+        criteria.append(db.and_(*equal, key < value if backwards else key > value))
+    return db.or_(*criteria)
+
+
+def _encode_cursor(item: Any, keys: tuple) -> str:
+    """Creates the cursor of a row from the values of its keys"""
+    values = []
+    for key in keys:
+        value = getattr(item, key.key)
+        values.append(value.isoformat() if isinstance(value, dt) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor: str | None, keys: tuple) -> list | None:
+    """Gives the values of the keys in a cursor, None if it isn't valid"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [
+            dt.fromisoformat(value) if key.type.python_type is dt else value
+            for key, value in zip(keys, values)
+        ]
+    except (binascii.Error, ValueError, TypeError):
+        return None
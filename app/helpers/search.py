@@ -0,0 +1,339 @@
+"""
+Helper module for the full-text search of articles.
+
+The articles are indexed in a table of their own: an FTS5 table
+(`articles_fts`) on SQLite, or a table of weighted tsvectors with a GIN index
+(`article_search`) on Postgres. Their title, summary, content, and keywords are
+indexed. The index is created along with the other tables (see
+`create_search_index`) and kept in sync as articles and their keywords are
+written (see the flush event in app.models). On other databases, articles are
+searched with LIKE.
+
+Classes:
+- SearchResult: An article that matched a search, and a snippet of it.
+
+Functions:
+- create_search_index(connection): Create the index, if it doesn't exist.
+- drop_search_index(connection): Drop the index.
+- index_articles(connection, article_ids): (Re)index articles, or all of them.
+- unindex_articles(connection, article_ids): Remove articles from the index.
+- articles_with_data(connection, data_ids) -> set[int]: Get the articles with
+  some data.
+- search_articles(user_id, query, limit) -> list[SearchResult]: Search the
+  articles of a user.
+"""
+import re
+from typing import Iterable, NamedTuple
+
+from markupsafe import Markup, escape
+from sqlalchemy.engine import Connection
+
+from app import db
+
+
+# the keys of the articles' data that are indexed as their keywords
+KEYWORD_KEYS = ("keyword", "keywords", "tags")
+# the text search configuration of Postgres
+TEXT_SEARCH_CONFIG = "english"
+# the number of words in a snippet
+SNIPPET_WORDS = 24
+# the matches are marked with these (private use) characters in the snippets,
+# which are replaced with <mark> tags once the snippets are escaped
+_MATCH_START = "\ue000"
+_MATCH_STOP = "\ue001"
+
+_SQLITE_KEYWORDS = """
+    SELECT group_concat(articledata.value, ' ')
+    FROM articledata
+    JOIN article_data_association_table AS association
+        ON association.data_id = articledata.id
+    WHERE association.article_id = articles.id
+        AND articledata.key IN :keys
+"""
+_POSTGRES_KEYWORDS = """
+    SELECT string_agg(articledata.value, ' ')
+    FROM articledata
+    JOIN article_data_association_table AS association
+        ON association.data_id = articledata.id
+    WHERE association.article_id = articles.id
+        AND articledata.key IN :keys
+"""
+
+
+class SearchResult(NamedTuple):
+    article_id: int
+    # the part of the article that matched, with the matches in <mark> tags
+    snippet: Markup
+
+
+def create_search_index(connection: Connection) -> None:
+    """
+    Creates the search index, if it doesn't exist.
+
+    Args:
+        connection (Connection): The connection to the database.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts "
+            "USING fts5(title, summary, content, keywords)"
+        )
+    elif dialect == "postgresql":
+        connection.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS article_search ("
+            "article_id INTEGER PRIMARY KEY "
+            "REFERENCES articles (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_article_search_document "
+            "ON article_search USING GIN (document)"
+        )
+
+
+def drop_search_index(connection: Connection) -> None:
+    """
+    Drops the search index, if it exists.
+
+    Args:
+        connection (Connection): The connection to the database.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS articles_fts")
+    elif dialect == "postgresql":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS article_search")
+
+
+def index_articles(connection: Connection, article_ids: Iterable[int] = None) -> None:
+    """
+    Indexes the articles, replacing what was indexed of them before.
+
+    Args:
+        connection (Connection): The connection to the database.
+        article_ids (Iterable[int], optional): The ids of the articles.
+        Defaults to None. If None, every article is (re)indexed.
+    """
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return
+    params = {"keys": list(KEYWORD_KEYS)}
+    if article_ids is None:
+        where = "1 = 1"
+    else:
+        params["ids"] = list(article_ids)
+        if not params["ids"]:
+            return
+        where = "articles.id IN :ids"
+    if dialect == "sqlite":
+        if article_ids is None:
+            connection.exec_driver_sql("DELETE FROM articles_fts")
+        else:
+            unindex_articles(connection, params["ids"])
+        statement = f"""
+            INSERT INTO articles_fts (rowid, title, summary, content, keywords)
+            SELECT
+                articles.id,
+                articles.title,
+                coalesce(articles.summary, ''),
+                articles.content,
+                coalesce(({_SQLITE_KEYWORDS}), '')
+            FROM articles
+            WHERE {where}
+        """
+    else:
+        config = TEXT_SEARCH_CONFIG
+        statement = f"""
+            INSERT INTO article_search (article_id, document)
+            SELECT
+                articles.id,
+                setweight(to_tsvector('{config}', articles.title), 'A')
+                || setweight(
+                    to_tsvector('{config}', coalesce(({_POSTGRES_KEYWORDS}), '')),
+                    'B'
+                )
+                || setweight(
+                    to_tsvector('{config}', coalesce(articles.summary, '')), 'B'
+                )
+                || setweight(to_tsvector('{config}', articles.content), 'C')
+            FROM articles
+            WHERE {where}
+            ON CONFLICT (article_id) DO UPDATE SET document = excluded.document
+        """
+    statement = db.text(statement).bindparams(
+        *(db.bindparam(name, expanding=True) for name in params)
+    )
+    connection.execute(statement, params)
+
+
+def unindex_articles(connection: Connection, article_ids: Iterable[int]) -> None:
+    """
+    Removes the articles from the search index.
+
+    Args:
+        connection (Connection): The connection to the database.
+        article_ids (Iterable[int]): The ids of the articles.
+    """
+    article_ids = list(article_ids)
+    dialect = connection.dialect.name
+    if not article_ids or dialect not in ("sqlite", "postgresql"):
+        return
+    if dialect == "sqlite":
+        statement = "DELETE FROM articles_fts WHERE rowid IN :ids"
+    else:
+        statement = "DELETE FROM article_search WHERE article_id IN :ids"
+    connection.execute(
+        db.text(statement).bindparams(db.bindparam("ids", expanding=True)),
+        {"ids": article_ids},
+    )
+
+
+def articles_with_data(connection: Connection, data_ids: Iterable[int]) -> set[int]:
+    """
+    Gives the articles the data is associated with.
+
+    Args:
+        connection (Connection): The connection to the database.
+        data_ids (Iterable[int]): The ids of the data.
+
+    Returns:
+        set[int]: The ids of the articles.
+    """
+    data_ids = list(data_ids)
+    if not data_ids:
+        return set()
+    statement = db.text(
+        "SELECT article_id FROM article_data_association_table "
+        "WHERE data_id IN :ids"
+    ).bindparams(db.bindparam("ids", expanding=True))
+    return set(connection.scalars(statement, {"ids": data_ids}))
+
+
+def search_articles(user_id: int, query: str, limit: int) -> list[SearchResult]:
+    """
+    Searches the articles of a user, best matches first.
+
+    Args:
+        user_id (int): The id of the user.
+        query (str): What to search for: the words the articles have to
+        contain (the last one can be the start of a word).
+        limit (int): The maximum number of results.
+
+    Returns:
+        list[SearchResult]: The matching articles.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        rows = _search_fts5(user_id, words, limit)
+    elif dialect == "postgresql":
+        rows = _search_tsvector(user_id, words, limit)
+    else:
+        rows = _search_like(user_id, words, limit)
+    return [
+        SearchResult(article_id=article_id, snippet=_highlight(snippet or ""))
+        for article_id, snippet in rows
+    ]
+
+
+def _search_fts5(user_id: int, words: list[str], limit: int) -> list:
+    """Searches the FTS5 index, ranking the matches with BM25"""
+    # each word is quoted so it isn't read as FTS5 syntax
+    match = " ".join(f'"{word}"' for word in words) + "*"
+    statement = db.text(
+        """
+        SELECT
+            articles_fts.rowid,
+            -- a snippet of the content (the title is shown anyway)
+            snippet(articles_fts, 2, :start, :stop, '…', :words)
+        FROM articles_fts
+        JOIN articles ON articles.id = articles_fts.rowid
+        WHERE articles_fts MATCH :match AND articles.user_id = :user_id
+        -- the weights of the title, summary, content, and keywords
+        ORDER BY bm25(articles_fts, 10.0, 5.0, 1.0, 5.0)
+        LIMIT :limit
+        """
+    )
+    return db.session.execute(
+        statement,
+        {
+            "start": _MATCH_START,
+            "stop": _MATCH_STOP,
+            "words": SNIPPET_WORDS,
+            "match": match,
+            "user_id": user_id,
+            "limit": limit,
+        },
+    ).all()
+
+
+def _search_tsvector(user_id: int, words: list[str], limit: int) -> list:
+    """Searches the tsvector index, ranking the matches with ts_rank_cd"""
+    config = TEXT_SEARCH_CONFIG
+    # the snippets (which are slow to make) are only made for the results
+    statement = db.text(
+        f"""
+        WITH search AS (
+            SELECT to_tsquery('{config}', :query) AS query
+        ), hits AS (
+            SELECT
+                article_search.article_id,
+                ts_rank_cd(article_search.document, search.query) AS rank
+            FROM article_search
+            JOIN articles ON articles.id = article_search.article_id
+            CROSS JOIN search
+            WHERE article_search.document @@ search.query
+                AND articles.user_id = :user_id
+            ORDER BY rank DESC
+            LIMIT :limit
+        )
+        SELECT
+            hits.article_id,
+            ts_headline(
+                '{config}',
+                concat_ws(' ', articles.summary, articles.content),
+                search.query,
+                :options
+            )
+        FROM hits
+        JOIN articles ON articles.id = hits.article_id
+        CROSS JOIN search
+        ORDER BY hits.rank DESC
+        """
+    )
+    query = " & ".join(words) + ":*"
+    options = (
+        f'StartSel="{_MATCH_START}", StopSel="{_MATCH_STOP}", '
+        f"MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 3}"
+    )
+    return db.session.execute(
+        statement,
+        {"query": query, "options": options, "user_id": user_id, "limit": limit},
+    ).all()
+
+
+def _search_like(user_id: int, words: list[str], limit: int) -> list:
+    """Searches the articles with LIKE, on databases without an index"""
+    from app.models import Article
+
+    query = db.select(Article.id, Article.summary).filter_by(user_id=user_id)
+    for word in words:
+        pattern = f"%{word}%"
+        query = query.filter(
+            Article.title.ilike(pattern)
+            | Article.summary.ilike(pattern)
+            | Article.content.ilike(pattern)
+        )
+    return db.session.execute(
+        query.order_by(Article.created_at.desc()).limit(limit)
+    ).all()
+
+
+def _highlight(snippet: str) -> Markup:
+    """Escapes a snippet and puts its matches in <mark> tags"""
+    html = str(escape(snippet))
+    html = html.replace(_MATCH_START, "<mark>").replace(_MATCH_STOP, "</mark>")
+    return Markup(html)
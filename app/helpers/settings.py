@@ -1,9 +1,112 @@
+import copy
 import json
+import os
 from pathlib import Path, PurePath
+from types import MappingProxyType
 
 from pelican import read_settings
 
 
+# Pelican's settings, keyed by the settings file (and its modification time)
+# and the overrides. Reading the settings parses and normalizes Pelican's
+# defaults, so they are read once per process. The settings are kept along with
+# their frozen (read-only all the way down) snapshot.
+_settings_cache: dict[tuple, tuple[dict, MappingProxyType]] = {}
+
+
+def settings_snapshot(
+    path: Path | str | None = None, override: dict | None = None
+) -> MappingProxyType:
+    """
+    Gives a read-only snapshot of Pelican's settings. The settings are only
+    read the first time they're requested for the given path and overrides.
+    The nested settings are read-only too (dicts are mappings and lists are
+    tuples), so use `pelican_settings` to get settings that can be changed or
+    serialized.
+
+    Args:
+        path (Path | str | None, optional): Path to the settings file.
+            Defaults to None.
+        override (dict | None, optional): The settings to override and their
+        values. Defaults to None.
+
+    Returns:
+        MappingProxyType: Pelican's settings
+    """
+    return _cached_settings(path=path, override=override)[1]
+
+
+def pelican_settings(
+    path: Path | str | None = None, override: dict | None = None
+) -> dict:
+    """
+    Gives a copy of Pelican's settings that can be changed (e.g., to pass to
+    Pelican) without affecting the cached settings.
+
+    Args:
+        path (Path | str | None, optional): Path to the settings file.
+            Defaults to None.
+        override (dict | None, optional): The settings to override and their
+        values. Defaults to None.
+
+    Returns:
+        dict: Pelican's settings
+    """
+    return copy.deepcopy(_cached_settings(path=path, override=override)[0])
+
+
+def clear_settings_cache() -> None:
+    """Forgets all of the cached settings"""
+    _settings_cache.clear()
+
+
+def _cached_settings(
+    path: Path | str | None, override: dict | None
+) -> tuple[dict, MappingProxyType]:
+    """
+    Gets the cached settings for the given path and overrides, reading them if
+    they haven't been read yet. The returned dict must not be changed.
+
+    Args:
+        path (Path | str | None): Path to the settings file.
+        override (dict | None): The settings to override and their values.
+
+    Returns:
+        tuple[dict, MappingProxyType]: Pelican's settings and their snapshot
+    """
+    key = (
+        str(path) if path else None,
+        os.stat(path).st_mtime_ns if path else None,
+        json.dumps(override or {}, sort_keys=True, default=str),
+    )
+    cached = _settings_cache.get(key)
+    if cached is None:
+        # Pelican may change the overrides in place
+        settings = read_settings(path=path, override=copy.deepcopy(override))
+        cached = _settings_cache[key] = (settings, _freeze(settings))
+    return cached
+
+
+def _freeze(value):
+    """
+    Gives a read-only copy of a value: dicts become read-only mappings and
+    lists (and sets) become tuples, all the way down.
+
+    Args:
+        value: The value to freeze.
+
+    Returns:
+        The frozen value.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
 def _default_settings_string() -> str:
     """
     Gives default Pelican settings as a string
@@ -11,7 +114,7 @@ def _default_settings_string() -> str:
     Returns:
         str: The string of the default Pelican settings
     """
-    return json.dumps(read_settings()).encode("utf-8")
+    return json.dumps(pelican_settings()).encode("utf-8")
 
 
 def _write_dict_to_file(fname: Path | str | None, contents: dict) -> Path:
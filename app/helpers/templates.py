@@ -0,0 +1,27 @@
+"""
+Helper module for rendering the templates of pages.
+
+Functions:
+- render_page(template_name: str, **context) -> str | Response: Render a
+  template, streaming it if the endpoint is in STREAMED_ENDPOINTS.
+"""
+from flask import Response, current_app, render_template, request, stream_template
+
+
+def render_page(template_name: str, **context) -> str | Response:
+    """
+    Renders the template of a page. If the endpoint of the request is one of
+    the app's STREAMED_ENDPOINTS, the page is streamed as it's rendered, so the
+    browser gets its head (and starts loading the styles) while the rest of
+    the page (e.g., a long article) is still being rendered.
+
+    Args:
+        template_name (str): The name of the template.
+        **context: The variables of the template.
+
+    Returns:
+        str | Response: The rendered page, or the response streaming it.
+    """
+    if request.endpoint in current_app.config["STREAMED_ENDPOINTS"]:
+        return Response(stream_template(template_name, **context))
+    return render_template(template_name, **context)
@@ -1,9 +1,8 @@
 import datetime as dt
 
 from flask import Flask
-from pygments import highlight
-from pygments.formatters import html
-from pygments.lexers import get_lexer_by_name
+
+from app.helpers.articles import highlight_code
 
 
 def datetime_format(value: dt.datetime, format: str = "%B %-d, %Y") -> str:
@@ -40,9 +39,7 @@ def highlight_syntax(code: str, lang: str = "python", style: str = "monokai") ->
     Adapted from:
     https://gist.github.com/deepns/22d366709a96f9e6fceba8abc8bdb156
     """
-    return highlight(
-        code=code, lexer=get_lexer_by_name(lang), formatter=html.HtmlFormatter()
-    )
+    return highlight_code(code, lang)
 
 
 def register_filters(app: Flask) -> Flask:
@@ -1,7 +1,7 @@
 from flask import Blueprint
 
 
-bp = Blueprint("main", __name__)
+bp = Blueprint("main", __name__, cli_group="albatross")
 
 
-from app.main import routes
+from app.main import commands, routes
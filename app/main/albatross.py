@@ -2,53 +2,392 @@ import os
 from pathlib import Path
 import shutil
 import tempfile
+from typing import NamedTuple
 
 import pelican
+from jinja2 import BytecodeCache
+from jinja2.bccache import Bucket
 
+from app import db
+from app.helpers.articles import current_html
+from app.helpers.settings import pelican_settings, settings_snapshot
 from app.jinja.filters import datetime_format
-from app.models import Article
+from app.main.artifacts import ArtifactCache
+from app.main.manifest import MANIFEST_NAME, BuildManifest, hash_settings, hash_text
+from app.main.reader import EXTENSION, POSTS_SETTING, AlbatrossPelican, Post
+from app.main.report import CompileReport
+from app.main.snapshot import ArticleSnapshot, as_snapshot
+from app.models import Article, ArticleData, User
+
+
+class _TemplateCache(BytecodeCache):
+    """
+    Keeps the theme's compiled templates in memory. Pelican creates a new Jinja
+    environment for every build, so without it a long-lived worker would
+    compile the same templates over and over. Jinja checks the source of a
+    template against its bytecode, so a changed template is compiled again.
+    """
+
+    def __init__(self):
+        self._bytecode = {}
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        bytecode = self._bytecode.get(bucket.key)
+        if bytecode is not None:
+            bucket.bytecode_from_string(bytecode)
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        self._bytecode[bucket.key] = bucket.bytecode_to_string()
+
+    def clear(self) -> None:
+        self._bytecode.clear()
+
+
+_template_cache = _TemplateCache()
+
+
+class PostFile(NamedTuple):
+    file_name: str
+    # the metadata and content of the post
+    text: str
+    digest: str
+
+
+def compile_articles(
+    user_id: int, include_drafts: bool = True, include_html: bool = False
+) -> list[ArticleSnapshot]:
+    """
+    Loads snapshots of a user's articles with everything needed to compile them
+    in a fixed number of queries, however many articles there are: one for the
+    articles (and their author) and one for the data of all of the articles.
+    Only the columns that are needed for compiling are loaded, and as rows
+    rather than Articles, so nothing is kept in the session.
+
+    Args:
+        user_id (int): The id of the user.
+        include_drafts (bool, optional): Whether or not to load drafts.
+        Defaults to True.
+        include_html (bool, optional): Whether or not to load the HTML cached
+        with the articles (if it's current). Defaults to False.
+
+    Returns:
+        list[ArticleSnapshot]: The snapshots of the articles, ordered by id.
+    """
+    articles_query = (
+        db.select(
+            Article.id,
+            Article.title,
+            Article.summary,
+            Article.content,
+            Article.created_at,
+            Article.slug,
+            Article.is_draft,
+            User.username,
+            User.username_lower,
+        )
+        .join(Article.user)
+        .filter(Article.user_id == user_id)
+        .order_by(Article.id)
+    )
+    data_query = (
+        db.select(Article.id, ArticleData.key, ArticleData.value)
+        .join(Article.data)
+        .filter(Article.user_id == user_id)
+        .order_by(ArticleData.id)
+    )
+    if not include_drafts:
+        articles_query = articles_query.filter(Article.is_draft.is_(False))
+        data_query = data_query.filter(Article.is_draft.is_(False))
+    if include_html:
+        articles_query = articles_query.add_columns(
+            Article.rendered_html, Article.rendered_fingerprint
+        )
+
+    data = {}
+    for article_id, key, value in db.session.execute(data_query):
+        data.setdefault(article_id, []).append((key, value))
+
+    snapshots = []
+    for row in db.session.execute(articles_query):
+        columns, rendered_html = tuple(row), None
+        if include_html:
+            *columns, html, fingerprint = columns
+            rendered_html = current_html(row.content, html, fingerprint)
+        snapshots.append(
+            ArticleSnapshot(
+                *columns, data=data.get(row.id, ()), rendered_html=rendered_html
+            )
+        )
+    return snapshots
 
 
 def compile_posts(
-    articles: list[Article], directory: Path = None, cleanup: bool = True
+    articles: list[Article | ArticleSnapshot],
+    directory: Path = None,
+    in_memory: bool = False,
+    artifacts: ArtifactCache = None,
+    report: CompileReport = None,
+    prerendered: bool = False,
 ) -> Path:
     """
     Compile a list of Article objects into Pelican-ready Markdown files and
-    compiles the site into an archive. Returns the output as an archive
-    (`{username}-output.zip`).
+    compiles the site. Returns the directory of the compiled site
+    (`...{username}-output`), which can be streamed as an archive with
+    `app.main.archive.stream_archive`.
+
+    The Markdown files are kept in a per-user build directory along with a
+    manifest of what was written for the previous build, so only the articles
+    that changed are rewritten (and deleted articles are removed). Pelican's
+    content cache is kept in the same directory so it only re-reads the files
+    that were rewritten. The posts are named after the articles' slugs, so
+    they keep their names from build to build. A change in the settings, the
+    theme, or Pelican's version starts the build over.
+
+    With an artifact cache, a site that was compiled before (from the same
+    posts, settings, Pelican version, and theme) isn't compiled again and the
+    cached site is returned instead. Newly compiled sites are added to it.
 
     Args:
-        articles (list[Article]): A list of Article objects to be compiled.
-        directory (Path, optional): The directory where the temporary directory
-        will be created. Defaults to None.
-        cleanup (bool, optional): Clean up output directory. NOTE: This does NOT
-        remove the archived output. Defaults to True.
+        articles (list[Article | ArticleSnapshot]): The articles (or snapshots
+        of the articles) to be compiled.
+        directory (Path, optional): The directory where the per-user build
+        directory will be created. Defaults to None. If None, the system's
+        temporary directory is used.
+        in_memory (bool, optional): Have Pelican read the articles from memory
+        instead of from Markdown files. Defaults to False.
+        artifacts (ArtifactCache, optional): The cache of compiled sites.
+        Defaults to None.
+        report (CompileReport, optional): Where to record the timing of the
+        stages of the compile. Defaults to None.
+        prerendered (bool, optional): When reading the articles from memory,
+        give Pelican the HTML Albatross rendered (and cached) for them, so it
+        doesn't convert their Markdown again. Articles without current HTML
+        are converted by Pelican. Defaults to False.
 
     Returns:
-        The path to the archive of the compiled site.
+        The path to the directory of the compiled site.
     """
+    articles = [as_snapshot(article) for article in articles]
+    report = report or CompileReport()
     # TODO: this will need to be the user settings once properly implemented
-    settings = pelican.read_settings()
-    with tempfile.TemporaryDirectory(prefix="content", dir=directory) as td:
-        for article in articles:
-            article_to_post(article=article, base_dir=td)
-
-        settings["PATH"] = td
-        settings["ARTICLE_PATHS"] = td
-        output_path = _output_path(articles[0])
-        settings["OUTPUT_PATH"] = output_path
-        pel = pelican.Pelican(settings=settings)
+    settings = pelican_settings()
+    settings_hash = hash_settings(settings)
+    theme_fingerprint = _theme_fingerprint(settings["THEME"])
+    # each article's metadata is built (and hashed) once, for the artifact key
+    # and for writing or reading the posts
+    with report.stage("metadata"):
+        if in_memory:
+            posts = create_posts(articles, prerendered=prerendered)
+            digests = {name: post.digest for name, post in posts.items()}
+            report.count(
+                "prerendered", sum(post.html is not None for post in posts.values())
+            )
+        else:
+            post_files = create_post_files(articles)
+            digests = {post.file_name: post.digest for post in post_files.values()}
+    if artifacts is not None:
+        key = artifact_key(digests, settings_hash, theme_fingerprint, in_memory)
+        cached_path = artifacts.get(key)
+        report.count("cached", cached_path is not None)
+        if cached_path is not None:
+            return cached_path
+
+    build_path = _build_path(articles[0], directory)
+    content_path = build_path / "content"
+    cache_path = build_path / "cache"
+
+    with report.stage("posts"):
+        manifest = BuildManifest.load(build_path / MANIFEST_NAME)
+        build_hash = hash_text(
+            "\n".join([settings_hash, theme_fingerprint, pelican.__version__])
+        )
+        if manifest.settings_hash != build_hash:
+            # the settings (or theme, or Pelican) can change every page of the
+            # site and what Pelican caches, so start over
+            shutil.rmtree(content_path, ignore_errors=True)
+            shutil.rmtree(cache_path, ignore_errors=True)
+            manifest.reset(build_hash)
+        content_path.mkdir(parents=True, exist_ok=True)
+
+        if in_memory:
+            settings[POSTS_SETTING] = posts
+            written = []
+        else:
+            written = write_post_files(
+                post_files=post_files, base_dir=content_path, manifest=manifest
+            )
+        manifest.save()
+    report.count("posts_written", len(written))
+
+    settings["PATH"] = str(content_path)
+    settings["ARTICLE_PATHS"] = str(content_path)
+    settings["CACHE_PATH"] = str(cache_path)
+    settings["CACHE_CONTENT"] = True
+    settings["LOAD_CONTENT_CACHE"] = True
+    # reuse the theme's templates compiled by earlier builds in this process
+    settings["JINJA_ENVIRONMENT"] = {
+        **settings["JINJA_ENVIRONMENT"],
+        "bytecode_cache": _template_cache,
+    }
+    output_path = _output_path(articles[0], directory=build_path)
+    settings["OUTPUT_PATH"] = output_path
+    with report.stage("pelican"):
+        if in_memory:
+            pel = AlbatrossPelican(settings=settings)
+        else:
+            pel = pelican.Pelican(settings=settings)
         pel.run()
 
-    zip_path = shutil.make_archive(output_path, "zip", output_path)
-    if cleanup:
-        shutil.rmtree(output_path)
-    return zip_path
+    if artifacts is None:
+        return Path(output_path)
+    with report.stage("artifact"):
+        return artifacts.put(key, output_path)
+
+
+def artifact_key(
+    digests: dict[str, str], settings_hash: str, theme_fingerprint: str, in_memory: bool
+) -> str:
+    """
+    Creates the key of a compiled site for the artifact cache. The key changes
+    whenever anything that goes into the site changes: the posts (content and
+    metadata), the settings, the versions of Pelican and the theme, and how
+    the posts are read.
+
+    Args:
+        digests (dict[str, str]): The digests of the posts, keyed by their
+        names.
+        settings_hash (str): The hash of the settings.
+        theme_fingerprint (str): The fingerprint of the theme's files.
+        in_memory (bool): Whether or not Pelican reads the posts from memory.
+
+    Returns:
+        str: The key.
+    """
+    parts = [
+        settings_hash,
+        pelican.__version__,
+        theme_fingerprint,
+        "memory" if in_memory else "files",
+    ]
+    parts.extend(f"{name}:{digest}" for name, digest in sorted(digests.items()))
+    return hash_text("\n".join(parts))
+
+
+def sync_posts(
+    articles: list[Article | ArticleSnapshot], base_dir: Path, manifest: BuildManifest
+) -> list[Path]:
+    """
+    Brings the posts in the directory up to date with the articles. Only the
+    posts whose contents changed since the last build are (re)written and the
+    posts of articles that no longer exist are removed. The manifest is updated
+    accordingly, but not saved.
+
+    Args:
+        articles (list[Article | ArticleSnapshot]): The articles to write posts
+        for.
+        base_dir (Path): The directory of the posts.
+        manifest (BuildManifest): The manifest of the previous build.
+
+    Returns:
+        list[Path]: The paths to the posts that were written.
+    """
+    return write_post_files(create_post_files(articles), base_dir, manifest)
+
+
+def create_post_files(
+    articles: list[Article | ArticleSnapshot],
+) -> dict[str, PostFile]:
+    """
+    Creates the text (metadata and content) of the articles' post files.
+
+    Args:
+        articles (list[Article | ArticleSnapshot]): The articles to create posts
+        for.
+
+    Returns:
+        dict[str, PostFile]: The posts, keyed by their articles' ids.
+    """
+    post_files = {}
+    for article in map(as_snapshot, articles):
+        text = _post_text(article.content, _create_metadata(article))
+        post_files[str(article.id)] = PostFile(
+            _post_file_name(article), text, hash_text(text)
+        )
+    return post_files
+
+
+def write_post_files(
+    post_files: dict[str, PostFile], base_dir: Path, manifest: BuildManifest
+) -> list[Path]:
+    """
+    Writes the post files that changed since the last build and removes the
+    posts of articles that no longer exist (see `sync_posts`).
+
+    Args:
+        post_files (dict[str, PostFile]): The posts, keyed by their articles'
+        ids.
+        base_dir (Path): The directory of the posts.
+        manifest (BuildManifest): The manifest of the previous build.
+
+    Returns:
+        list[Path]: The paths to the posts that were written.
+    """
+    base_dir = Path(base_dir)
+    written = []
+    for key, (file_name, text, digest) in post_files.items():
+        if manifest.is_current(key, file_name, digest):
+            if (base_dir / file_name).exists():
+                continue
+
+        previous = manifest.articles.get(key)
+        if previous and previous["file"] != file_name:
+            (base_dir / previous["file"]).unlink(missing_ok=True)
+
+        written.append(create_post_file(text, base_dir / file_name))
+        manifest.record(key, file_name, digest)
+
+    for file_name in manifest.forget(set(manifest.articles) - set(post_files)):
+        (base_dir / file_name).unlink(missing_ok=True)
+
+    return written
+
+
+def create_posts(
+    articles: list[Article | ArticleSnapshot], prerendered: bool = False
+) -> dict[str, Post]:
+    """
+    Creates the in-memory posts of the articles for `AlbatrossPelican`.
+
+    Args:
+        articles (list[Article | ArticleSnapshot]): The articles to create posts
+        for.
+        prerendered (bool, optional): Give the posts the HTML Albatross
+        rendered for the articles (when it's current). Defaults to False.
+
+    Returns:
+        dict[str, Post]: The posts, keyed by their (file) names.
+    """
+    posts = {}
+    for article in map(as_snapshot, articles):
+        metadata = _create_metadata(article)
+        # no need to format the date only for Pelican to parse it again
+        metadata["date"] = article.created_at
+        text = _post_text(article.content, metadata)
+        html = article.rendered_html if prerendered else None
+        if html is not None:
+            # the HTML is what goes into the site, so it's part of the post
+            text = f"{text}\n{html}"
+        file_name = _post_file_name(article, extension=EXTENSION)
+        posts[file_name] = Post(article.content, metadata, hash_text(text), html)
+    return posts
 
 
 def create_post(content: str, metadata: dict, base_dir: Path) -> Path:
     """
-    Create a new (temporary) article file with the given metadata and content.
+    Create an article file with the given metadata and content. The file is
+    named after the slug in the metadata, so the same article is always written
+    to the same file (which lets Pelican's content cache recognize it). Without
+    a slug, a new temporary file is created.
 
     Args:
         content (str): The content of the article.
@@ -56,43 +395,49 @@ def create_post(content: str, metadata: dict, base_dir: Path) -> Path:
         base_dir (Path): The base directory where the article file will be created.
 
     Returns:
-        Path: path to the temporary article file
+        Path: path to the article file
     """
+    if metadata.get("slug"):
+        return create_post_file(
+            _post_text(content, metadata), Path(base_dir) / f"{metadata['slug']}.md"
+        )
+
     temp_fd, temp_path = tempfile.mkstemp(
         suffix=".md",
         prefix="albatross-",
         dir=base_dir,
     )
-    text = "---\n"
-    for key, value in metadata.items():
-        # metadata can be a list (set here) or a string, integer, ...
-        if isinstance(value, set):
-            text += f"{key}: {', '.join(sorted([v for v in value]))}\n"
-        else:
-            text += f"{key}: {value}\n"
-    text += "---\n\n" + content
-
     with os.fdopen(temp_fd, "w+") as tf:
-        tf.write(text)
-    # a Markdown post for Pelican has the following format:
-    # ---
-    # metadata_key_1: metadata_value_1
-    # metadata_key_2: metadata_value_2
-    # ...
-    # metadata_key_n: metadata_value_n
-    # ---
-    # content
+        tf.write(_post_text(content, metadata))
     file_path = Path(temp_path)
 
     return file_path
 
 
-def article_to_post(article: Article, base_dir: Path) -> Path:
+def create_post_file(text: str, path: Path) -> Path:
+    """
+    Writes the text of a post to the given path, replacing the file if it
+    exists.
+
+    Args:
+        text (str): The text of the post (metadata and content).
+        path (Path): The path of the post file.
+
+    Returns:
+        Path: The path of the post file.
+    """
+    path = Path(path)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def article_to_post(article: Article | ArticleSnapshot, base_dir: Path) -> Path:
     """
     Convert an Article object to a Pelican-ready markdown post.
 
     Args:
-        article (Article): The article to convert.
+        article (Article | ArticleSnapshot): The article to convert.
         base_dir (Path): The base directory where the post file will be created.
 
     Returns:
@@ -102,12 +447,12 @@ def article_to_post(article: Article, base_dir: Path) -> Path:
     return create_post(article.content, metadata, base_dir)
 
 
-def _create_metadata(article: Article) -> dict:
+def _create_metadata(article: Article | ArticleSnapshot) -> dict:
     """
     Create a dictionary of metadata for a Pelican-ready markdown post.
 
     Args:
-        article (Article): The article to create metadata for.
+        article (Article | ArticleSnapshot): The article to create metadata for.
 
     Returns:
         dict: The metadata dictionary.
@@ -115,6 +460,7 @@ def _create_metadata(article: Article) -> dict:
     Metadata info found at:
     https://docs.getpelican.com/en/stable/content.html#file-metadata
     """
+    article = as_snapshot(article)
     metadata_lists = ["tags", "keywords"]
     metadata = {}
     for data in article.data:
@@ -127,7 +473,7 @@ def _create_metadata(article: Article) -> dict:
             metadata[data.key] = data.value
 
     # TODO: this will need to be the user settings once properly implemented
-    settings = pelican.read_settings()
+    settings = settings_snapshot()
     # TODO:
     # - make this date format the default setting and allow the user to update this
     # - set the modified date as the same above, but only if it's not `None`
@@ -135,7 +481,7 @@ def _create_metadata(article: Article) -> dict:
     date_format_str = settings["DEFAULT_DATE_FORMAT"]
     metadata.update(
         {
-            "author": article.user.username,
+            "author": article.author,
             "title": article.title,
             "date": datetime_format(article.created_at, date_format_str),
             # "modified": datetime_format(article.updated_at, date_format_str),
@@ -149,19 +495,105 @@ def _create_metadata(article: Article) -> dict:
     return metadata
 
 
-def _output_path(article: Article, *args) -> Path:
+def _output_path(
+    article: Article | ArticleSnapshot, *args, directory: Path = None
+) -> Path:
     """Returns the output path for Pelican
 
     Args:
-        article (Article): the article to get the username from
+        article (Article | ArticleSnapshot): the article to get the username from
+        directory (Path, optional): the directory to create the output
+        directory in. Defaults to None. If None, the system's temporary
+        directory is used.
 
     Returns:
         Path: the output path
     """
-    parts = [article.user.username_lower]
+    parts = [as_snapshot(article).username_lower]
     parts.extend(args)
     parts.extend(["output"])
     # return Path("-".join(parts))
 
-    temp_path = tempfile.mkdtemp(suffix="-".join(parts))
+    temp_path = tempfile.mkdtemp(suffix="-".join(parts), dir=directory)
     return temp_path
+
+
+def _theme_fingerprint(theme: str) -> str:
+    """Returns a fingerprint of a theme's files (their paths, sizes, and
+    modification times)
+
+    Args:
+        theme (str): the path to the theme
+
+    Returns:
+        str: the fingerprint
+    """
+    stamps = []
+    for dirpath, dirnames, filenames in os.walk(theme):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            stat = os.stat(os.path.join(dirpath, filename))
+            path = os.path.relpath(os.path.join(dirpath, filename), theme)
+            stamps.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hash_text("\n".join(stamps))
+
+
+def _post_text(content: str, metadata: dict) -> str:
+    """
+    Creates the text of a Markdown post for Pelican.
+
+    Args:
+        content (str): The content of the article.
+        metadata (dict): The metadata for the article.
+
+    Returns:
+        str: The text of the post.
+    """
+    text = "---\n"
+    for key, value in metadata.items():
+        # metadata can be a list (set here) or a string, integer, ...
+        if isinstance(value, set):
+            text += f"{key}: {', '.join(sorted([v for v in value]))}\n"
+        else:
+            text += f"{key}: {value}\n"
+    text += "---\n\n" + content
+    # a Markdown post for Pelican has the following format:
+    # ---
+    # metadata_key_1: metadata_value_1
+    # metadata_key_2: metadata_value_2
+    # ...
+    # metadata_key_n: metadata_value_n
+    # ---
+    # content
+    return text
+
+
+def _post_file_name(article: Article | ArticleSnapshot, extension: str = "md") -> str:
+    """Returns the (stable) file name of an article's post, derived from its slug
+    so that it's the same from build to build
+
+    Args:
+        article (Article | ArticleSnapshot): the article
+        extension (str, optional): the extension of the file. Defaults to "md".
+
+    Returns:
+        str: the file name
+    """
+    return f"{article.slug}.{extension}"
+
+
+def _build_path(article: Article | ArticleSnapshot, directory: Path = None) -> Path:
+    """Returns the path to the user's build directory
+
+    Args:
+        article (Article | ArticleSnapshot): the article to get the username from
+        directory (Path, optional): the directory containing the build
+        directories. Defaults to None. If None, the system's temporary directory
+        is used.
+
+    Returns:
+        Path: the build path
+    """
+    if directory is None:
+        directory = Path(tempfile.gettempdir()) / "albatross"
+    return Path(directory) / as_snapshot(article).username_lower
@@ -0,0 +1,113 @@
+import io
+import logging
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class _ArchiveBuffer(io.RawIOBase):
+    """
+    Unseekable file-like object that holds on to whatever is written to it
+    until it's taken. Writing a zip file to it lets the archive be sent while
+    it's being created.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        """
+        Takes the bytes written since the last time this was called.
+
+        Returns:
+            bytes: the bytes written
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_archive(
+    directory: Path | str, compresslevel: int = 6, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Zips the contents of a directory, yielding the archive as it's created.
+    Nothing is written to disk and only about a chunk of each file is held in
+    memory at a time.
+
+    Args:
+        directory (Path | str): The directory to zip.
+        compresslevel (int, optional): The compression level, from 0 (no
+        compression) to 9. Defaults to 6.
+        chunk_size (int, optional): The number of bytes to read from a file at
+        a time. Defaults to 64 KiB.
+
+    Yields:
+        Iterator[bytes]: The chunks of the archive.
+    """
+    directory = Path(directory)
+    start = time.perf_counter()
+    num_files = num_bytes = 0
+    buffer = _ArchiveBuffer()
+    compression = zipfile.ZIP_DEFLATED if compresslevel else zipfile.ZIP_STORED
+    with zipfile.ZipFile(
+        buffer, "w", compression=compression, compresslevel=compresslevel or None
+    ) as archive:
+        for path in _walk_files(directory):
+            num_files += 1
+            info = zipfile.ZipInfo.from_file(path, path.relative_to(directory))
+            info.compress_type = compression
+            with open(path, "rb") as src, archive.open(
+                info, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT
+            ) as dest:
+                while chunk := src.read(chunk_size):
+                    dest.write(chunk)
+                    if data := buffer.take():
+                        num_bytes += len(data)
+                        yield data
+            if data := buffer.take():
+                num_bytes += len(data)
+                yield data
+
+    # the archive's central directory is written when it's closed
+    if data := buffer.take():
+        num_bytes += len(data)
+        yield data
+    logger.info(
+        "Archived %s (%d files, %d bytes, level %d) in %.3fs",
+        directory,
+        num_files,
+        num_bytes,
+        compresslevel,
+        time.perf_counter() - start,
+    )
+
+
+def _walk_files(directory: Path) -> Iterator[Path]:
+    """
+    Walks the files of a directory (and its subdirectories) in a stable order.
+
+    Args:
+        directory (Path): The directory to walk.
+
+    Yields:
+        Iterator[Path]: The paths of the files.
+    """
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            yield Path(dirpath) / filename
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+# the cache's directory within the build folder; the leading dot keeps it from
+# clashing with the per-user build directories
+ARTIFACTS_DIR = ".artifacts"
+SITE_DIR = "site"
+SIZE_FILE = "size"
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of compiled sites. Each site is stored under a key
+    that identifies everything that went into it (see
+    `app.main.albatross.artifact_key`), so compiling the same articles with the
+    same settings again can reuse it. Every artifact is a directory holding the
+    site and its size:
+
+        {root}/{key}/site/...
+        {root}/{key}/size
+
+    The modification time of the size file is the last time the artifact was
+    used; once the artifacts take up more than the quota, the least recently
+    used ones are evicted.
+    """
+
+    def __init__(self, root: Path | str, quota: int | None = None):
+        self.root = Path(root)
+        self.quota = quota
+        # the keys of the artifacts evicted by this instance, so the builds
+        # that refer to them can be expired
+        self.evicted = []
+
+    def get(self, key: str) -> Path | None:
+        """
+        Gets the site stored under the key, marking it as used.
+
+        Args:
+            key (str): The key of the site.
+
+        Returns:
+            Path | None: The path to the site, or None if it isn't cached.
+        """
+        size_path = self.root / key / SIZE_FILE
+        try:
+            os.utime(size_path)
+        except FileNotFoundError:
+            return None
+        return self.root / key / SITE_DIR
+
+    def put(self, key: str, site_path: Path | str) -> Path:
+        """
+        Moves a site into the cache under the key, then evicts the least
+        recently used artifacts if the cache is over its quota (see `evicted`).
+        If the key is
+        already cached (e.g., another worker compiled the same site), the site
+        is removed and the cached one is used instead.
+
+        Args:
+            key (str): The key of the site.
+            site_path (Path | str): The path to the site.
+
+        Returns:
+            Path: The path to the cached site.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_path = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        shutil.move(str(site_path), temp_path / SITE_DIR)
+        (temp_path / SIZE_FILE).write_text(str(_directory_size(temp_path / SITE_DIR)))
+
+        try:
+            temp_path.rename(self.root / key)
+        except OSError:
+            # the key is already cached
+            shutil.rmtree(temp_path, ignore_errors=True)
+            if self.get(key) is None:
+                raise
+
+        self.evict(keep={key})
+        return self.root / key / SITE_DIR
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the site stored under the key (if there is one).
+
+        Args:
+            key (str): The key of the site.
+        """
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def key_of(self, site_path: Path | str) -> str | None:
+        """
+        Gives the key of a site in the cache.
+
+        Args:
+            site_path (Path | str): The path to the site.
+
+        Returns:
+            str | None: The key, or None if the site isn't in this cache.
+        """
+        site_path = Path(site_path)
+        if site_path.name != SITE_DIR or site_path.parent.parent != self.root:
+            return None
+        return site_path.parent.name
+
+    def evict(self, keep: set[str] = None) -> list[str]:
+        """
+        Removes the least recently used artifacts until the cache is within its
+        quota.
+
+        Args:
+            keep (set[str], optional): Keys that must not be evicted. Defaults
+            to None.
+
+        Returns:
+            list[str]: The keys of the evicted artifacts.
+        """
+        if self.quota is None:
+            return []
+
+        keep = keep or set()
+        artifacts = sorted(self.artifacts(), key=lambda artifact: artifact[1])
+        total = sum(size for _, _, size in artifacts)
+        evicted = []
+        for key, _, size in artifacts:
+            if total <= self.quota:
+                break
+            if key in keep:
+                continue
+            self.remove(key)
+            total -= size
+            evicted.append(key)
+        self.evicted.extend(evicted)
+        return evicted
+
+    def artifacts(self) -> list[tuple[str, float, int]]:
+        """
+        Lists the cached artifacts.
+
+        Returns:
+            list[tuple[str, float, int]]: The key, last time used, and size (in
+            bytes) of each artifact.
+        """
+        artifacts = []
+        if not self.root.is_dir():
+            return artifacts
+
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            size_path = Path(entry.path) / SIZE_FILE
+            try:
+                last_used = size_path.stat().st_mtime
+                size = int(size_path.read_text())
+            except (OSError, ValueError):
+                continue
+            artifacts.append((entry.name, last_used, size))
+        return artifacts
+
+
+def _directory_size(path: Path) -> int:
+    """
+    Gives the total size of the files in a directory (and its subdirectories).
+
+    Args:
+        path (Path): The directory.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, _, filenames in os.walk(path)
+        for filename in filenames
+    )
@@ -0,0 +1,193 @@
+"""
+Compiling every user's site at once (e.g., after a theme upgrade).
+
+`flask albatross compile-all` queues a job for every user with articles,
+tagged with the id of the batch, and runs them with the resident workers of
+`app.main.jobs.run_worker`. The workers claim the jobs one at a time, so the
+users are spread over the processes as they become free. Since the jobs are
+rows in the database, a batch that was interrupted can be resumed: only the
+users without a queued or finished job in the batch are queued again.
+"""
+import uuid
+from datetime import datetime as dt
+from typing import NamedTuple
+
+from app import db, models
+
+
+class BatchSummary(NamedTuple):
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    # (username, error) of each failed job
+    failures: list[tuple[str, str]]
+    # the time from the first job starting to the last one finishing
+    seconds: float
+
+    @property
+    def total(self) -> int:
+        return self.queued + self.running + self.succeeded + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """The number of sites compiled per second"""
+        finished = self.succeeded + self.failed
+        return finished / self.seconds if self.seconds else 0.0
+
+
+def new_batch() -> str:
+    """
+    Creates the id of a new batch.
+
+    Returns:
+        str: The id.
+    """
+    return f"{dt.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def enqueue_batch(batch: str, retry_failed: bool = False) -> int:
+    """
+    Queues a compile job in the batch for every user with articles who doesn't
+    have one yet. The in-flight jobs of users are added to the batch instead
+    of queuing another one. When resuming a batch, the jobs that were left
+    running by a crash are queued again.
+
+    Args:
+        batch (str): The id of the batch.
+        retry_failed (bool, optional): Queue the failed jobs of the batch
+        again. Defaults to False.
+
+    Returns:
+        int: The number of jobs that were queued (or added to the batch).
+    """
+    CompileJob = models.CompileJob
+    # the jobs left running by a crash still hold their users' leases
+    requeued = db.session.execute(
+        db.update(CompileJob)
+        .where(CompileJob.batch == batch, CompileJob.status == CompileJob.RUNNING)
+        .values(status=CompileJob.QUEUED, started_at=None)
+    ).rowcount
+    if retry_failed:
+        requeued += _requeue_failed(batch)
+
+    # users with a compile in flight (from any batch, or none) get that job
+    # since a user only has one at a time, so it's added to the batch
+    attached = db.session.execute(
+        db.update(CompileJob)
+        .where(
+            CompileJob.lease.is_not(None),
+            (CompileJob.batch != batch) | CompileJob.batch.is_(None),
+        )
+        .values(batch=batch)
+    ).rowcount
+
+    has_articles = db.select(models.Article.id).filter(
+        models.Article.user_id == models.User.id
+    )
+    has_job = db.select(CompileJob.id).filter(
+        CompileJob.user_id == models.User.id,
+        (CompileJob.batch == batch) | CompileJob.lease.is_not(None),
+    )
+    user_ids = db.session.scalars(
+        db.select(models.User.id)
+        .filter(has_articles.exists(), ~has_job.exists())
+        .order_by(models.User.id)
+    ).all()
+    if user_ids:
+        db.session.execute(
+            db.insert(CompileJob),
+            [
+                {
+                    "user_id": user_id,
+                    "status": CompileJob.QUEUED,
+                    "batch": batch,
+                    "lease": CompileJob.lease_for(user_id),
+                }
+                for user_id in user_ids
+            ],
+        )
+    db.session.commit()
+    return requeued + attached + len(user_ids)
+
+
+def _requeue_failed(batch: str) -> int:
+    """
+    Queues the failed jobs of a batch again, taking their users' leases back.
+    Users who have another job in flight keep that one instead. The changes
+    aren't committed.
+
+    Args:
+        batch (str): The id of the batch.
+
+    Returns:
+        int: The number of jobs that were queued.
+    """
+    CompileJob = models.CompileJob
+    in_flight = db.select(CompileJob.user_id).filter(CompileJob.lease.is_not(None))
+    failed = db.session.execute(
+        db.select(CompileJob.id, CompileJob.user_id)
+        .filter(
+            CompileJob.batch == batch,
+            CompileJob.status == CompileJob.FAILED,
+            CompileJob.user_id.not_in(in_flight),
+        )
+        .order_by(CompileJob.id.desc())
+    ).all()
+    # only one job per user can hold the lease
+    jobs = {user_id: job_id for job_id, user_id in failed}
+    if jobs:
+        db.session.execute(
+            db.update(CompileJob),
+            [
+                {
+                    "id": job_id,
+                    "status": CompileJob.QUEUED,
+                    "lease": CompileJob.lease_for(user_id),
+                    "started_at": None,
+                    "finished_at": None,
+                    "error": None,
+                }
+                for user_id, job_id in jobs.items()
+            ],
+        )
+    return len(jobs)
+
+
+def summarize_batch(batch: str) -> BatchSummary:
+    """
+    Summarizes the jobs of a batch.
+
+    Args:
+        batch (str): The id of the batch.
+
+    Returns:
+        BatchSummary: The summary.
+    """
+    CompileJob = models.CompileJob
+    counts = dict(
+        db.session.execute(
+            db.select(CompileJob.status, db.func.count())
+            .filter_by(batch=batch)
+            .group_by(CompileJob.status)
+        ).all()
+    )
+    started, finished = db.session.execute(
+        db.select(
+            db.func.min(CompileJob.started_at), db.func.max(CompileJob.finished_at)
+        ).filter_by(batch=batch)
+    ).one()
+    failures = db.session.execute(
+        db.select(models.User.username, CompileJob.error)
+        .join(CompileJob.user)
+        .filter(CompileJob.batch == batch, CompileJob.status == CompileJob.FAILED)
+        .order_by(models.User.username)
+    ).all()
+    return BatchSummary(
+        queued=counts.get(CompileJob.QUEUED, 0),
+        running=counts.get(CompileJob.RUNNING, 0),
+        succeeded=counts.get(CompileJob.SUCCEEDED, 0),
+        failed=counts.get(CompileJob.FAILED, 0),
+        failures=[tuple(failure) for failure in failures],
+        seconds=(finished - started).total_seconds() if started and finished else 0.0,
+    )
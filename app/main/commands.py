@@ -0,0 +1,147 @@
+import click
+from flask import current_app
+
+from app import db, models
+from app.helpers import search
+from app.main import batches, bp, jobs, prerender, retention
+
+
+@bp.cli.command("worker")
+@click.option(
+    "--processes", "-p", type=int, default=None, help="Number of worker processes."
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds between checks for new jobs.",
+)
+@click.option("--burst", is_flag=True, help="Stop once there are no queued jobs.")
+@click.option(
+    "--max-builds",
+    type=int,
+    default=None,
+    help="Jobs a worker runs before it's replaced (default: WORKER_MAX_BUILDS).",
+)
+@click.option(
+    "--max-memory",
+    type=int,
+    default=None,
+    help="Bytes a worker uses before it's replaced (default: WORKER_MAX_MEMORY).",
+)
+def worker(processes, poll_interval, burst, max_builds, max_memory):
+    """Run queued compile jobs."""
+    num_jobs = jobs.run_worker(
+        processes=processes,
+        poll_interval=poll_interval,
+        burst=burst,
+        max_builds=max_builds,
+        max_memory=max_memory,
+    )
+    click.echo(f"Ran {num_jobs} compile job(s).")
+
+
+@bp.cli.command("gc")
+@click.option(
+    "--keep",
+    type=int,
+    default=None,
+    help="Builds of each user to keep (default: ARTIFACT_KEEP_BUILDS).",
+)
+@click.option(
+    "--quota",
+    type=int,
+    default=None,
+    help="Bytes of compiled sites to keep (default: ARTIFACT_CACHE_QUOTA).",
+)
+def gc(keep, quota):
+    """Remove old compiled sites."""
+    config = current_app.config
+    report = retention.collect_garbage(
+        config["BUILD_FOLDER"],
+        keep=config["ARTIFACT_KEEP_BUILDS"] if keep is None else keep,
+        quota=config["ARTIFACT_CACHE_QUOTA"] if quota is None else quota,
+        scratch=config["COMPILE_SCRATCH_FOLDER"],
+    )
+    click.echo(
+        f"Expired {report.expired_builds} build(s), removed "
+        f"{report.removed_artifacts} compiled site(s) and "
+        f"{report.removed_leftovers} leftover directory(ies)."
+    )
+
+
+@bp.cli.command("compile-all")
+@click.option(
+    "--processes", "-p", type=int, default=None, help="Number of worker processes."
+)
+@click.option("--resume", "batch", default=None, help="Id of a batch to resume.")
+@click.option(
+    "--retry-failed", is_flag=True, help="Queue the failed jobs of the batch again."
+)
+def compile_all(processes, batch, retry_failed):
+    """Compile the site of every user with articles."""
+    batch = batch or batches.new_batch()
+    num_queued = batches.enqueue_batch(batch, retry_failed=retry_failed)
+    click.echo(f"Batch {batch}: queued {num_queued} compile job(s).")
+
+    jobs.run_worker(processes=processes, burst=True)
+
+    summary = batches.summarize_batch(batch)
+    click.echo(
+        f"Batch {batch}: {summary.succeeded} succeeded, {summary.failed} failed "
+        f"of {summary.total} in {summary.seconds:.1f}s "
+        f"({summary.throughput:.2f} sites/s)."
+    )
+    for username, error in summary.failures:
+        click.echo(f"  {username}: {error}")
+    if summary.queued or summary.running:
+        click.echo(f"Resume with: flask albatross compile-all --resume {batch}")
+
+
+@bp.cli.command("recount")
+def recount():
+    """Recompute the users' article counters."""
+    models.User.recount_articles()
+    db.session.commit()
+    click.echo("Recounted the users' articles.")
+
+
+@bp.cli.command("reindex")
+def reindex():
+    """Rebuild the search index of the articles."""
+    connection = db.session.connection()
+    search.drop_search_index(connection)
+    search.create_search_index(connection)
+    search.index_articles(connection)
+    db.session.commit()
+    click.echo("Reindexed the articles.")
+
+
+@bp.cli.command("prerender")
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only the articles created or updated since then.",
+)
+@click.option("--user", "username", default=None, help="Only the user's articles.")
+@click.option(
+    "--processes", "-p", type=int, default=None, help="Number of render processes."
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=prerender.BATCH_SIZE,
+    show_default=True,
+    help="Articles loaded and stored at a time.",
+)
+def prerender_articles(since, username, processes, batch_size):
+    """Render the HTML of the articles ahead of time."""
+    summary = prerender.prerender_articles(
+        since=since, username=username, processes=processes, batch_size=batch_size
+    )
+    click.echo(
+        f"Rendered {summary.rendered} article(s), {summary.skipped} already "
+        f"current, in {summary.seconds:.1f}s ({summary.throughput:.1f} articles/s)."
+    )
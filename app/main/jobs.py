@@ -0,0 +1,450 @@
+"""
+Background compilation of users' sites.
+
+The web app only queues a CompileJob; `flask albatross worker` starts resident
+worker processes that claim the queued jobs and compile them, so Pelican never
+runs in a request. The workers warm up once and serve many jobs, so a job
+doesn't pay for Pelican's startup.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+from datetime import timedelta
+from multiprocessing import connection
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app, db, models
+from app.main.albatross import compile_articles, compile_posts
+from app.main.artifacts import ARTIFACTS_DIR, ArtifactCache
+from app.main.report import CompileReport, memory_usage
+from app.main.retention import expire_artifacts
+from app.main.snapshot import ArticleSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+# exit codes of a worker process
+IDLE = 0  # there were no more queued jobs (burst mode)
+RECYCLE = 3  # the worker should be replaced with a fresh one
+
+# times to look for (or queue) a user's job before giving up
+ENQUEUE_ATTEMPTS = 3
+
+
+def enqueue_compile(user: models.User) -> models.CompileJob:
+    """
+    Queues a job to compile the user's site. A user only has one compile in
+    flight at a time: if the user already has a queued or running job, that
+    job is returned instead (so a second request gets the same site). A job
+    that has been running for longer than COMPILE_LEASE_TIMEOUT is assumed to
+    be lost and is failed to make way for the new one.
+
+    Args:
+        user (models.User): The user whose site to compile.
+
+    Returns:
+        models.CompileJob: The queued (or in-flight) job.
+    """
+    lease = models.CompileJob.lease_for(user.id)
+    for attempt in range(ENQUEUE_ATTEMPTS):
+        job = db.session.scalar(db.select(models.CompileJob).filter_by(lease=lease))
+        if job is not None and not _is_stale(job):
+            return job
+        if job is not None:
+            logger.warning("Compile job %s timed out", job.id)
+            job.fail("The compile timed out.")
+            db.session.commit()
+
+        job = models.CompileJob(user=user, status=models.CompileJob.QUEUED, lease=lease)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another request queued a job for the user first, so use that one
+            db.session.rollback()
+            if attempt == ENQUEUE_ATTEMPTS - 1:
+                raise
+            continue
+        return job
+
+
+def run_compile_job(job_id: int, directory: Path = None) -> models.CompileJob:
+    """
+    Compiles the site of a (claimed) job and records the outcome on the job.
+
+    Args:
+        job_id (int): The id of the job.
+        directory (Path, optional): The directory containing the build
+        directories (and the cache of compiled sites). Defaults to None. If
+        None, the app's BUILD_FOLDER is used.
+
+    Returns:
+        models.CompileJob: The finished job.
+    """
+    if directory is None:
+        directory = current_app.config["BUILD_FOLDER"]
+
+    job = db.session.get(models.CompileJob, job_id)
+    report = CompileReport()
+    # Pelican only reads the articles' cached HTML when it reads from memory
+    in_memory = current_app.config["COMPILE_IN_MEMORY"]
+    prerendered = in_memory and current_app.config["COMPILE_PRERENDERED"]
+    artifacts = ArtifactCache(
+        Path(directory) / ARTIFACTS_DIR,
+        quota=current_app.config["ARTIFACT_CACHE_QUOTA"],
+    )
+    try:
+        with report.stage("query"):
+            articles = compile_articles(
+                job.user_id,
+                include_drafts=current_app.config["COMPILE_DRAFTS"],
+                include_html=prerendered,
+            )
+        report.count("articles", len(articles))
+        # the snapshots don't need the session, so don't hold on to it (or its
+        # connection) while Pelican runs
+        db.session.close()
+        if not articles:
+            raise ValueError("There are no articles to compile.")
+        build_directory = _build_directory(directory, articles)
+        report.count("scratch", build_directory != Path(directory))
+        artifact_path = compile_posts(
+            articles=articles,
+            directory=build_directory,
+            in_memory=in_memory,
+            artifacts=artifacts,
+            report=report,
+            prerendered=prerendered,
+        )
+        job = db.session.get(models.CompileJob, job_id)
+        if artifacts.evicted:
+            # the builds of the sites evicted to make room for this one can't
+            # be downloaded anymore
+            expire_artifacts(artifacts, set(artifacts.evicted))
+        if not _holds_lease(job):
+            db.session.commit()
+            return job
+        job.succeed(artifact_path)
+    except Exception as e:
+        logger.exception("Compile job %s failed", job_id)
+        db.session.rollback()
+        job = db.session.get(models.CompileJob, job_id)
+        if not _holds_lease(job):
+            return job
+        job.fail(str(e))
+    job.report = report.to_dict()
+    db.session.commit()
+    logger.info(
+        "Compile job %s (user %s) %s in %s",
+        job_id,
+        job.user_id,
+        job.status,
+        report.summary(),
+    )
+    return job
+
+
+def run_worker(
+    processes: int = None,
+    poll_interval: float = 1.0,
+    burst: bool = False,
+    max_builds: int = None,
+    max_memory: int = None,
+) -> int:
+    """
+    Runs queued jobs in resident worker processes until interrupted. Each
+    worker creates the app and warms up Pelican (imports, settings, Markdown
+    extensions, and the theme's templates) once, then claims and runs jobs
+    itself. A worker is replaced with a fresh one after it has run
+    `max_builds` jobs or once it uses more than `max_memory` bytes, and when
+    it dies (failing the job it was running).
+
+    Args:
+        processes (int, optional): The number of worker processes. Defaults to
+        None. If None, the number of CPUs is used.
+        poll_interval (float, optional): Seconds between checks for new jobs.
+        Defaults to 1.0.
+        burst (bool, optional): Stop once there are no more queued jobs.
+        Defaults to False.
+        max_builds (int, optional): The number of jobs a worker runs before it
+        is replaced. Defaults to None. If None, the app's WORKER_MAX_BUILDS is
+        used.
+        max_memory (int, optional): The memory (in bytes) a worker can use
+        before it is replaced. Defaults to None. If None, the app's
+        WORKER_MAX_MEMORY is used.
+
+    Returns:
+        int: The number of jobs that were run.
+    """
+    processes = processes or os.cpu_count() or 1
+    context = multiprocessing.get_context()
+    num_jobs = context.Value("i", 0)
+    # the workers create their apps with this app's configuration, not the
+    # default one
+    config = _worker_config()
+    # slot -> (process, id of the job it's running)
+    workers = {}
+
+    def start_worker(slot: int) -> None:
+        current_job = context.Value("i", 0)
+        process = context.Process(
+            target=_worker_main,
+            args=(
+                config,
+                current_job,
+                num_jobs,
+                poll_interval,
+                burst,
+                max_builds,
+                max_memory,
+            ),
+            name=f"albatross-worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        workers[slot] = (process, current_job)
+
+    for slot in range(processes):
+        start_worker(slot)
+
+    try:
+        while workers:
+            connection.wait(
+                [process.sentinel for process, _ in workers.values()],
+                timeout=poll_interval,
+            )
+            for slot, (process, current_job) in list(workers.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del workers[slot]
+                if process.exitcode == IDLE:
+                    continue
+                if process.exitcode != RECYCLE:
+                    logger.error(
+                        "Worker %s exited with code %s", process.name, process.exitcode
+                    )
+                    if current_job.value:
+                        # the worker died before it could record the failure
+                        _fail_job(
+                            current_job.value,
+                            f"The worker exited with code {process.exitcode}.",
+                        )
+                start_worker(slot)
+    finally:
+        for process, _ in workers.values():
+            process.terminate()
+            process.join()
+    return num_jobs.value
+
+
+def work(
+    current_job: Synchronized = None,
+    num_jobs: Synchronized = None,
+    poll_interval: float = 1.0,
+    burst: bool = False,
+    max_builds: int = None,
+    max_memory: int = None,
+) -> int:
+    """
+    Claims and runs queued jobs until the worker should be replaced (or, in
+    burst mode, until there are no queued jobs).
+
+    Args:
+        current_job (Synchronized, optional): Where to share the id of the job
+        being run (0 when there isn't one). Defaults to None.
+        num_jobs (Synchronized, optional): The shared count of jobs run by all
+        the workers. Defaults to None.
+        poll_interval (float, optional): Seconds between checks for new jobs.
+        Defaults to 1.0.
+        burst (bool, optional): Stop once there are no more queued jobs.
+        Defaults to False.
+        max_builds (int, optional): The number of jobs to run before stopping.
+        Defaults to None. If None, the app's WORKER_MAX_BUILDS is used.
+        max_memory (int, optional): The memory (in bytes) that can be used
+        before stopping. Defaults to None. If None, the app's
+        WORKER_MAX_MEMORY is used.
+
+    Returns:
+        int: IDLE if there were no more queued jobs (burst mode) or RECYCLE if
+        the worker should be replaced.
+    """
+    max_builds = max_builds or current_app.config["WORKER_MAX_BUILDS"]
+    max_memory = max_memory or current_app.config["WORKER_MAX_MEMORY"]
+    builds = 0
+    while True:
+        job_id = models.CompileJob.claim_next()
+        if job_id is None:
+            if burst:
+                return IDLE
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("Claimed compile job %s", job_id)
+        if current_job is not None:
+            current_job.value = job_id
+        run_compile_job(job_id)
+        db.session.remove()
+        if current_job is not None:
+            current_job.value = 0
+        if num_jobs is not None:
+            with num_jobs.get_lock():
+                num_jobs.value += 1
+
+        builds += 1
+        if builds >= max_builds or memory_usage() > max_memory:
+            return RECYCLE
+
+
+def prewarm() -> None:
+    """
+    Compiles a small site and throws it away so that everything a build needs
+    (Pelican's modules, the settings, Markdown extensions, and the theme's
+    compiled templates) is loaded before the first real job.
+    """
+    article = ArticleSnapshot(
+        id=0,
+        title="Warm-up",
+        summary="Warm-up",
+        content="# Warm-up\n\n```python\nprint('warm-up')\n```",
+        created_at=dt.utcnow(),
+        slug="warm-up",
+        is_draft=False,
+        author="albatross",
+        username_lower="albatross",
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        compile_posts(
+            articles=[article],
+            directory=directory,
+            in_memory=current_app.config["COMPILE_IN_MEMORY"],
+        )
+
+
+def _build_directory(directory: Path | str, articles: list[ArticleSnapshot]) -> Path:
+    """
+    Chooses where to build a user's site: in the scratch folder
+    (COMPILE_SCRATCH_FOLDER, a RAM-backed directory), if there is one and the
+    articles fit in COMPILE_SCRATCH_MAX_BYTES, and in the build folder
+    otherwise. The user's build directory in the other one is removed, so it
+    doesn't go stale (or hold on to memory).
+
+    Args:
+        directory (Path | str): The build folder.
+        articles (list[ArticleSnapshot]): The articles of the site.
+
+    Returns:
+        Path: The directory to create the user's build directory in.
+    """
+    directory = Path(directory)
+    scratch = current_app.config["COMPILE_SCRATCH_FOLDER"]
+    if not scratch:
+        return directory
+
+    scratch = Path(scratch)
+    size = sum(len(article.content.encode()) for article in articles)
+    if size <= current_app.config["COMPILE_SCRATCH_MAX_BYTES"]:
+        chosen, other = scratch, directory
+    else:
+        chosen, other = directory, scratch
+    shutil.rmtree(other / articles[0].username_lower, ignore_errors=True)
+    return chosen
+
+
+def _worker_config() -> SimpleNamespace:
+    """
+    Gives the configuration of the current app in a form that can be sent to
+    a worker process and passed to `create_app`.
+
+    Returns:
+        SimpleNamespace: The configuration.
+    """
+    return SimpleNamespace(
+        **{key: value for key, value in current_app.config.items() if key.isupper()}
+    )
+
+
+def _worker_main(
+    config: SimpleNamespace,
+    current_job: Synchronized,
+    num_jobs: Synchronized,
+    poll_interval: float,
+    burst: bool,
+    max_builds: int,
+    max_memory: int,
+) -> None:
+    """Creates the app of a worker process, warms it up, and runs jobs."""
+    app = create_app(config)
+    with app.app_context():
+        try:
+            prewarm()
+        except Exception:
+            # a real build will report whatever is wrong
+            logger.exception("Warming up the worker failed")
+        code = work(
+            current_job=current_job,
+            num_jobs=num_jobs,
+            poll_interval=poll_interval,
+            burst=burst,
+            max_builds=max_builds,
+            max_memory=max_memory,
+        )
+    sys.exit(code)
+
+
+def _holds_lease(job: models.CompileJob) -> bool:
+    """
+    Checks that a job is still the user's compile in flight. A job that was
+    taken for lost (see `enqueue_compile`) was already failed and replaced,
+    so its outcome mustn't be recorded.
+
+    Args:
+        job (models.CompileJob): The job.
+
+    Returns:
+        bool: Whether or not the job still holds its lease.
+    """
+    if not job.is_finished:
+        return True
+    logger.warning("Compile job %s lost its lease, dropping its result", job.id)
+    return False
+
+
+def _is_stale(job: models.CompileJob) -> bool:
+    """
+    Checks if a running job has been running for too long to still be alive.
+
+    Args:
+        job (models.CompileJob): The job.
+
+    Returns:
+        bool: Whether or not the job is stale.
+    """
+    if job.status != models.CompileJob.RUNNING or job.started_at is None:
+        return False
+    timeout = timedelta(seconds=current_app.config["COMPILE_LEASE_TIMEOUT"])
+    return dt.utcnow() - job.started_at > timeout
+
+
+def _fail_job(job_id: int, error: str) -> None:
+    """
+    Marks a job as failed.
+
+    Args:
+        job_id (int): The id of the job.
+        error (str): Why the job failed.
+    """
+    job = db.session.get(models.CompileJob, job_id)
+    if job is not None and not job.is_finished:
+        job.fail(error)
+        db.session.commit()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+from pathlib import Path
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_text(text: str) -> str:
+    """
+    Hashes the given text.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: The hex digest of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_settings(settings: dict) -> str:
+    """
+    Hashes a dictionary of (Pelican) settings. Values that can't be serialized
+    to JSON are hashed using their string representation.
+
+    Args:
+        settings (dict): The settings to hash.
+
+    Returns:
+        str: The hex digest of the settings.
+    """
+    return hash_text(json.dumps(settings, sort_keys=True, default=str))
+
+
+class BuildManifest:
+    """
+    Record of what went into a user's previous build. For every article, the
+    manifest stores the name of the file the article was written to and the
+    hash of that file's contents (metadata included). It also stores the hash
+    of the settings used for the build, since a change there invalidates
+    everything.
+    """
+
+    def __init__(self, path: Path, settings_hash: str = None, articles: dict = None):
+        self.path = Path(path)
+        self.settings_hash = settings_hash
+        self.articles = articles if articles is not None else {}
+
+    @classmethod
+    def load(cls, path: Path | str) -> "BuildManifest":
+        """
+        Loads the manifest at the given path. A missing, unreadable, or outdated
+        manifest results in an empty manifest (i.e., a full build).
+
+        Args:
+            path (Path | str): Path to the manifest file.
+
+        Returns:
+            BuildManifest: The loaded manifest.
+        """
+        path = Path(path)
+        try:
+            with open(path, "r") as f:
+                contents = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+
+        if contents.get("version") != MANIFEST_VERSION:
+            return cls(path)
+
+        return cls(
+            path,
+            settings_hash=contents.get("settings"),
+            articles=contents.get("articles", {}),
+        )
+
+    def save(self) -> Path:
+        """
+        Writes the manifest to disk.
+
+        Returns:
+            Path: Path to the manifest file.
+        """
+        contents = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings_hash,
+            "articles": self.articles,
+        }
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(contents, f, sort_keys=True)
+        temp_path.replace(self.path)
+
+        return self.path
+
+    def is_current(self, key: str, file_name: str, digest: str) -> bool:
+        """
+        Checks if an article has been written with the same contents before.
+
+        Args:
+            key (str): The key of the article.
+            file_name (str): The name of the file the article is written to.
+            digest (str): The hash of the file contents.
+
+        Returns:
+            bool: True if the article doesn't need to be rewritten.
+        """
+        entry = self.articles.get(key)
+        if entry is None:
+            return False
+        return entry["file"] == file_name and entry["hash"] == digest
+
+    def record(self, key: str, file_name: str, digest: str) -> None:
+        """
+        Records the file name and hash of an article.
+
+        Args:
+            key (str): The key of the article.
+            file_name (str): The name of the file the article is written to.
+            digest (str): The hash of the file contents.
+        """
+        self.articles[key] = {"file": file_name, "hash": digest}
+
+    def forget(self, keys: set[str]) -> list[str]:
+        """
+        Removes the given articles from the manifest.
+
+        Args:
+            keys (set[str]): The keys of the articles to remove.
+
+        Returns:
+            list[str]: The file names of the removed articles.
+        """
+        return [self.articles.pop(key)["file"] for key in keys if key in self.articles]
+
+    def reset(self, settings_hash: str) -> None:
+        """
+        Empties the manifest and sets the new settings hash.
+
+        Args:
+            settings_hash (str): The hash of the settings for the new build.
+        """
+        self.settings_hash = settings_hash
+        self.articles = {}
@@ -0,0 +1,141 @@
+"""
+Rendering the HTML of every article ahead of time (e.g., after a deploy or an
+upgrade of the renderer).
+
+`flask albatross prerender` goes through the articles in batches of ids (so
+it never holds more than a batch in memory), renders the ones whose cached
+HTML isn't current (see `app.models.Article.render`) in a pool of processes,
+and stores the HTML, one transaction per batch. An interrupted run can be
+started again: the articles it rendered are skipped.
+"""
+import multiprocessing
+import os
+import time
+from datetime import datetime as dt
+from typing import Iterator, NamedTuple
+
+from app import db, models
+from app.helpers.articles import content_fingerprint, render_markdown
+
+
+BATCH_SIZE = 500
+
+
+class PrerenderSummary(NamedTuple):
+    rendered: int
+    # the articles whose HTML was already current
+    skipped: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """The number of articles checked per second"""
+        total = self.rendered + self.skipped
+        return total / self.seconds if self.seconds else 0.0
+
+
+def prerender_articles(
+    since: dt = None,
+    username: str = None,
+    processes: int = None,
+    batch_size: int = BATCH_SIZE,
+) -> PrerenderSummary:
+    """
+    Renders the HTML of the articles whose cached HTML isn't current.
+
+    Args:
+        since (dt, optional): Only the articles created or updated since then.
+        Defaults to None.
+        username (str, optional): Only the articles of this user. Defaults to
+        None.
+        processes (int, optional): The number of processes to render in.
+        Defaults to None. If None, the number of CPUs is used.
+        batch_size (int, optional): The number of articles loaded (and stored)
+        at a time. Defaults to BATCH_SIZE.
+
+    Returns:
+        PrerenderSummary: What was rendered.
+    """
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    rendered = skipped = 0
+
+    pool = multiprocessing.get_context().Pool(processes) if processes > 1 else None
+    try:
+        for rows in _batches(since, username, batch_size):
+            stale = []
+            for row in rows:
+                fingerprint = content_fingerprint(row.content)
+                if row.rendered_fingerprint != fingerprint:
+                    stale.append((row, fingerprint))
+            skipped += len(rows) - len(stale)
+            if not stale:
+                continue
+
+            contents = [row.content for row, _ in stale]
+            if pool is None:
+                html = list(map(render_markdown, contents))
+            else:
+                chunksize = max(len(contents) // (processes * 4), 1)
+                html = pool.map(render_markdown, contents, chunksize=chunksize)
+            db.session.execute(
+                db.update(models.Article),
+                [
+                    {
+                        "id": row.id,
+                        "rendered_html": row_html,
+                        "rendered_fingerprint": fingerprint,
+                        # rendering isn't an update of the article
+                        "updated_at": row.updated_at,
+                    }
+                    for (row, fingerprint), row_html in zip(stale, html)
+                ],
+            )
+            db.session.commit()
+            rendered += len(stale)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return PrerenderSummary(
+        rendered=rendered, skipped=skipped, seconds=time.perf_counter() - start
+    )
+
+
+def _batches(since: dt, username: str, batch_size: int) -> Iterator[list]:
+    """
+    Loads the articles to render in batches, in the order of their ids. Each
+    batch starts after the last id of the previous one, so a batch costs the
+    same however far into the articles it is.
+
+    Args:
+        since (dt): Only the articles created or updated since then.
+        username (str): Only the articles of this user.
+        batch_size (int): The number of articles in a batch.
+
+    Yields:
+        list: The id, content, fingerprint, and update time of the articles.
+    """
+    Article = models.Article
+    query = db.select(
+        Article.id, Article.content, Article.rendered_fingerprint, Article.updated_at
+    ).order_by(Article.id)
+    if since is not None:
+        query = query.filter(
+            db.func.coalesce(Article.updated_at, Article.created_at) >= since
+        )
+    if username is not None:
+        query = query.join(Article.user).filter(
+            models.User.username_lower == username.lower()
+        )
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            query.filter(Article.id > last_id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
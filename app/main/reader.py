@@ -0,0 +1,106 @@
+"""
+Pelican reader and generator that read articles straight from memory.
+
+Instead of writing every article to a Markdown file for Pelican to find and
+parse, the posts are handed to Pelican through its settings
+(`ALBATROSS_POSTS`, a mapping of post names to `Post`s). The generator lists
+the posts instead of walking the content directory, and the reader converts a
+post's Markdown without serializing and parsing its metadata. A post can also
+carry its content already rendered as HTML (by Albatross, see
+`app.models.Article.render`), in which case the reader doesn't convert it.
+"""
+import datetime as dt
+import os
+from typing import NamedTuple
+
+import pelican
+from markdown import Markdown
+from pelican.generators import ArticlesGenerator
+from pelican.readers import MarkdownReader
+from pelican.utils import SafeDatetime
+
+
+POSTS_SETTING = "ALBATROSS_POSTS"
+EXTENSION = "albatross"
+
+
+class Post(NamedTuple):
+    content: str
+    metadata: dict
+    # identifies the content and metadata, used as the "file stamp" by
+    # Pelican's content cache
+    digest: str
+    # the content already rendered as HTML, if it's used instead of Markdown
+    html: str | None = None
+
+
+class AlbatrossReader(MarkdownReader):
+    """Reads the posts given in the settings instead of files"""
+
+    file_extensions = [EXTENSION]
+
+    def read(self, source_path):
+        """Convert the content of a post and process its metadata"""
+        post = self.settings[POSTS_SETTING][os.path.basename(source_path)]
+
+        self._source_path = source_path
+        self._md = Markdown(**self.settings["MARKDOWN"])
+        # the metadata isn't part of the content, so don't look for it there
+        # (the meta extension may not be in the user's MARKDOWN settings)
+        self._md.preprocessors.deregister("meta", strict=False)
+        if post.html is not None:
+            content = post.html
+        else:
+            content = self._md.convert(post.content)
+
+        metadata = {}
+        for name, value in post.metadata.items():
+            metadata[name] = self._process_value(name, value)
+        return content, metadata
+
+    def _process_value(self, name, value):
+        """Turn a metadata value into what Pelican expects"""
+        if isinstance(value, dt.datetime):
+            return SafeDatetime.combine(value.date(), value.time())
+        if name in self.settings["FORMATTED_FIELDS"]:
+            self._md.reset()
+            return self.process_metadata(name, self._md.convert(value))
+        if isinstance(value, (set, list, tuple)):
+            value = sorted(value)
+            if name not in ("tags", "authors"):
+                value = ", ".join(value)
+            return self.process_metadata(name, value)
+        return self.process_metadata(name, str(value))
+
+
+class AlbatrossArticlesGenerator(ArticlesGenerator):
+    """Generates the articles of the posts given in the settings"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the posts aren't files, so their digests take the place of the
+        # modification times when checking if the cached content is current
+        self._filestamp_func = self._post_digest
+        self.readers._filestamp_func = self._post_digest
+
+    def get_files(self, paths, exclude=[], extensions=None):
+        return set(self.settings[POSTS_SETTING])
+
+    def _post_digest(self, path: str) -> str:
+        post = self.settings[POSTS_SETTING].get(os.path.basename(path))
+        return post.digest if post else ""
+
+
+class AlbatrossPelican(pelican.Pelican):
+    """Pelican that reads articles from the posts given in the settings"""
+
+    def __init__(self, settings):
+        settings.setdefault("READERS", {})
+        settings["READERS"][EXTENSION] = AlbatrossReader
+        super().__init__(settings)
+
+    def _get_generator_classes(self):
+        return [
+            AlbatrossArticlesGenerator if generator is ArticlesGenerator else generator
+            for generator in super()._get_generator_classes()
+        ]
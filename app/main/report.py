@@ -0,0 +1,104 @@
+"""
+Timing and resource usage of the stages of a compile.
+
+A `CompileReport` is filled in while a site is compiled (see
+`app.main.jobs.run_compile_job`) and stored on the CompileJob, so slow sites
+(and regressions) can be tracked down stage by stage.
+"""
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class CompileReport:
+    """
+    Records the wall-clock time, CPU time, and memory of each stage of a
+    compile, along with counts of what the stages did.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times a stage of the compile. The stage is recorded even if it fails.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append(
+                {
+                    "name": name,
+                    "seconds": round(time.perf_counter() - start, 6),
+                    "cpu_seconds": round(time.process_time() - start_cpu, 6),
+                    "rss": memory_usage(),
+                }
+            )
+
+    def count(self, name: str, value: int | bool) -> None:
+        """
+        Records a count (or flag) of the compile.
+
+        Args:
+            name (str): The name of the count.
+            value (int | bool): The value.
+        """
+        self.counts[name] = value
+
+    def to_dict(self) -> dict:
+        """
+        Gives the report as a JSON-serializable dictionary.
+
+        Returns:
+            dict: The stages, the counts, and the totals.
+        """
+        return {
+            "stages": list(self.stages),
+            "counts": dict(self.counts),
+            "seconds": round(sum(stage["seconds"] for stage in self.stages), 6),
+            "cpu_seconds": round(sum(stage["cpu_seconds"] for stage in self.stages), 6),
+            "max_rss": max((stage["rss"] for stage in self.stages), default=0),
+        }
+
+    def summary(self) -> str:
+        """
+        Gives a one-line summary of the report, for the log.
+
+        Returns:
+            str: The summary.
+        """
+        report = self.to_dict()
+        stages = ", ".join(
+            f"{stage['name']} {stage['seconds']:.3f}s" for stage in report["stages"]
+        )
+        counts = ", ".join(
+            f"{name}={value}" for name, value in report["counts"].items()
+        )
+        return (
+            f"{report['seconds']:.3f}s ({stages}); {counts}; "
+            f"max RSS {report['max_rss'] / 1_000_000:.1f} MB"
+        )
+
+
+def memory_usage() -> int:
+    """
+    Gives the memory used by this process (its resident set size).
+
+    Returns:
+        int: The memory used, in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # not Linux: fall back to the peak usage (in KiB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
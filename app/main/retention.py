@@ -0,0 +1,194 @@
+"""
+Garbage collection of compiled sites.
+
+The compiled sites live in the artifact cache (see `app.main.artifacts`) and
+are referenced by the CompileJobs that built them. `collect_garbage` (run by
+`flask albatross gc`) applies the retention policy:
+
+1. only the last `keep` builds of each user keep their sites,
+2. sites no build has referred to for a while are removed,
+3. the least recently used sites are removed until the cache is within its
+   byte budget, and
+4. leftovers of interrupted builds (output directories outside the cache,
+   including the ones in the scratch folder, and temporary directories inside
+   it) are removed.
+"""
+import shutil
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from app import db, models
+from app.main.artifacts import ARTIFACTS_DIR, ArtifactCache
+
+
+# how old (in seconds) a leftover directory has to be before it's removed, so
+# that the directories of builds that are still running are left alone
+STALE_AFTER = 60 * 60
+
+
+class GarbageReport(NamedTuple):
+    expired_builds: int
+    removed_artifacts: int
+    removed_leftovers: int
+
+
+def collect_garbage(
+    directory: Path | str, keep: int, quota: int = None, scratch: Path | str = None
+) -> GarbageReport:
+    """
+    Applies the retention policy to the compiled sites.
+
+    Args:
+        directory (Path | str): The build folder.
+        keep (int): The number of builds of each user whose sites are kept.
+        quota (int, optional): The byte budget of the artifact cache. Defaults
+        to None. If None, the cache can grow without bounds.
+        scratch (Path | str, optional): The scratch folder sites are also built
+        in. Defaults to None.
+
+    Returns:
+        GarbageReport: What was removed.
+    """
+    directory = Path(directory)
+    cache = ArtifactCache(directory / ARTIFACTS_DIR, quota=quota)
+
+    expired = expire_builds(keep)
+    referenced = _referenced_keys(cache)
+    # a site that was just compiled (or reused) may not be referenced yet
+    cutoff = time.time() - STALE_AFTER
+    removed = [
+        key
+        for key, last_used, _ in cache.artifacts()
+        if key not in referenced and last_used < cutoff
+    ]
+    for key in removed:
+        cache.remove(key)
+    evicted = cache.evict()
+    if evicted:
+        expire_artifacts(cache, set(evicted))
+    db.session.commit()
+
+    build_folders = [directory, Path(scratch)] if scratch else [directory]
+    leftovers = _remove_leftovers(build_folders, cache)
+    return GarbageReport(
+        expired_builds=len(expired),
+        removed_artifacts=len(removed) + len(evicted),
+        removed_leftovers=leftovers,
+    )
+
+
+def expire_builds(keep: int) -> list[int]:
+    """
+    Expires the builds of each user beyond the last `keep` ones. The changes
+    aren't committed.
+
+    Args:
+        keep (int): The number of builds of each user to keep.
+
+    Returns:
+        list[int]: The ids of the expired builds.
+    """
+    position = (
+        db.func.row_number()
+        .over(
+            partition_by=models.CompileJob.user_id,
+            order_by=(
+                models.CompileJob.finished_at.desc(),
+                models.CompileJob.id.desc(),
+            ),
+        )
+        .label("position")
+    )
+    builds = (
+        db.select(models.CompileJob.id, position)
+        .filter(models.CompileJob.artifact_path.is_not(None))
+        .subquery()
+    )
+    ids = db.session.scalars(
+        db.select(builds.c.id).filter(builds.c.position > keep)
+    ).all()
+    if ids:
+        db.session.execute(
+            db.update(models.CompileJob)
+            .where(models.CompileJob.id.in_(ids))
+            .values(artifact_path=None)
+        )
+    return ids
+
+
+def _referenced_keys(cache: ArtifactCache) -> set[str]:
+    """
+    Gives the keys of the sites that builds refer to.
+
+    Args:
+        cache (ArtifactCache): The artifact cache.
+
+    Returns:
+        set[str]: The keys.
+    """
+    paths = db.session.scalars(
+        db.select(models.CompileJob.artifact_path)
+        .filter(models.CompileJob.artifact_path.is_not(None))
+        .distinct()
+    )
+    return {cache.key_of(path) for path in paths} - {None}
+
+
+def expire_artifacts(cache: ArtifactCache, keys: set[str]) -> None:
+    """
+    Expires the builds whose sites were removed from the cache. The changes
+    aren't committed.
+
+    Args:
+        cache (ArtifactCache): The artifact cache.
+        keys (set[str]): The keys of the removed sites.
+    """
+    jobs = db.session.scalars(
+        db.select(models.CompileJob).filter(
+            models.CompileJob.artifact_path.is_not(None)
+        )
+    )
+    for job in jobs:
+        if cache.key_of(job.artifact_path) in keys:
+            job.expire()
+
+
+def _remove_leftovers(build_folders: list[Path], cache: ArtifactCache) -> int:
+    """
+    Removes the output directories left in the users' build directories and
+    the temporary directories left in the cache by interrupted builds.
+
+    Args:
+        build_folders (list[Path]): The folders containing the users' build
+        directories.
+        cache (ArtifactCache): The artifact cache.
+
+    Returns:
+        int: The number of directories removed.
+    """
+    candidates = list(cache.root.glob(".tmp-*")) if cache.root.is_dir() else []
+    for directory in build_folders:
+        if not directory.is_dir():
+            continue
+        for build_path in directory.iterdir():
+            if build_path == cache.root or not build_path.is_dir():
+                continue
+            candidates.extend(build_path.glob("*-output"))
+
+    referenced = set(
+        db.session.scalars(
+            db.select(models.CompileJob.artifact_path).filter(
+                models.CompileJob.artifact_path.is_not(None)
+            )
+        )
+    )
+    removed = 0
+    cutoff = time.time() - STALE_AFTER
+    for path in candidates:
+        if str(path) in referenced:
+            continue
+        if path.is_dir() and path.stat().st_mtime < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,12 +1,22 @@
-import atexit
+from pathlib import Path
 
-from flask import flash, redirect, render_template, send_file, url_for
+from flask import (
+    Response,
+    abort,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from flask_login import current_user, login_required
 
-from app.main.albatross import compile_posts
 from app import db, models
 from app.decorators import own_resource_required
-from app.main import bp, forms
+from app.main import bp, forms, jobs
+from app.main.archive import stream_archive
 
 
 @bp.route("/")
@@ -56,15 +66,141 @@ def compile_site(username):
     form = forms.CompileForm()
     if form.validate_on_submit():
         # What this should do:
-        # 1. compile the user's articles (if any) to a static site into the "output"
-        #    directory
-        # 2. zip the "output" directory
-        # 3. notify the user that the compilation (and zipping) is complete
+        # 1. queue the compilation of the user's articles (if any) to a static
+        #    site; a worker (`flask albatross worker`) compiles it
+        # 2. notify the user that the compilation is complete
         #   a. do it by email
         #   b. flash the user
         #   c. both? something else?
+        #   for now, the user polls the job's status
         user = models.User.query.filter_by(username_lower=username.lower()).first()
-        output_path = compile_posts(articles=user.articles)
-        response = send_file(output_path, as_attachment=True)
-        return response
+        job = jobs.enqueue_compile(user)
+        info = _job_to_dict(job)
+        if _wants_html():
+            return redirect(info["status_url"], code=303)
+        return jsonify(info), 202, {"Location": info["status_url"]}
     return redirect(url_for("main.profile", username=username.lower()))
+
+
+@bp.route("/u/<username>/compile/<int:job_id>")
+@login_required
+@own_resource_required(redirect_route="main.index")
+def compile_status(username, job_id):
+    job = _get_job_or_404(job_id)
+    info = _job_to_dict(job)
+    if _wants_html():
+        return render_template(
+            "main/compile_status.html", title="Compile", job=job, info=info
+        )
+    return jsonify(info)
+
+
+@bp.route("/u/<username>/compile/<int:job_id>/download")
+@login_required
+@own_resource_required(redirect_route="main.index")
+def download_site(username, job_id):
+    job = _get_job_or_404(job_id)
+    if job.status != models.CompileJob.SUCCEEDED:
+        abort(409)
+    if job.is_expired:
+        abort(410)
+    output_path = Path(job.artifact_path)
+    if not output_path.is_dir():
+        abort(404)
+
+    level = request.args.get(
+        "level", current_app.config["ARCHIVE_COMPRESSION_LEVEL"], type=int
+    )
+    file_name = f"{job.user.username_lower}-output.zip"
+    return Response(
+        stream_archive(output_path, compresslevel=min(max(level, 0), 9)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={file_name}"},
+    )
+
+
+@bp.route("/u/<username>/compile/<int:job_id>/report")
+@login_required
+@own_resource_required(redirect_route="main.index")
+def compile_report(username, job_id):
+    job = _get_job_or_404(job_id)
+    if job.report is None:
+        abort(409)
+    return jsonify(job.report)
+
+
+@bp.route("/u/<username>/builds")
+@login_required
+@own_resource_required(redirect_route="main.index")
+def list_builds(username):
+    page = request.args.get("page", 1, type=int)
+    per_page = current_app.config["BUILDS_PER_PAGE"]
+    pagination = db.paginate(
+        db.select(models.CompileJob)
+        .filter_by(user_id=current_user.id)
+        .order_by(models.CompileJob.id.desc()),
+        page=page,
+        per_page=per_page,
+        error_out=False,
+    )
+    return jsonify(
+        {
+            "builds": [_job_to_dict(job) for job in pagination.items],
+            "page": pagination.page,
+            "pages": pagination.pages,
+            "total": pagination.total,
+        }
+    )
+
+
+def _wants_html() -> bool:
+    """
+    Checks if the request prefers an HTML page (e.g., a browser) over JSON.
+
+    Returns:
+        bool: Whether or not to respond with HTML.
+    """
+    best = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return best == "text/html"
+
+
+def _get_job_or_404(job_id: int) -> models.CompileJob:
+    """
+    Gets the current user's compile job with the given id.
+
+    Args:
+        job_id (int): The id of the job.
+
+    Returns:
+        models.CompileJob: The job. Aborts with a 404 if the job doesn't exist
+        or belongs to a different user.
+    """
+    return db.first_or_404(
+        db.select(models.CompileJob).filter_by(id=job_id, user_id=current_user.id)
+    )
+
+
+def _job_to_dict(job: models.CompileJob) -> dict:
+    """
+    Gives the job's info along with its URLs.
+
+    Args:
+        job (models.CompileJob): The job.
+
+    Returns:
+        dict: The job's info.
+    """
+    info = job.to_dict()
+    username = job.user.username_lower
+    info["status_url"] = url_for(
+        "main.compile_status", username=username, job_id=job.id
+    )
+    if job.report is not None:
+        info["report_url"] = url_for(
+            "main.compile_report", username=username, job_id=job.id
+        )
+    if job.status == models.CompileJob.SUCCEEDED and not job.is_expired:
+        info["download_url"] = url_for(
+            "main.download_site", username=username, job_id=job.id
+        )
+    return info
@@ -0,0 +1,135 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from app.helpers.articles import current_html
+from app.models import Article
+
+
+class ArticleDatum(NamedTuple):
+    key: str
+    value: str
+
+
+class ArticleSnapshot:
+    """
+    Immutable copy of what the build needs from an article (and its author and
+    data). Unlike an Article, a snapshot isn't tied to a database session, is
+    small, and can be pickled to send it to another process.
+    """
+
+    __slots__ = (
+        "id",
+        "title",
+        "summary",
+        "content",
+        "created_at",
+        "slug",
+        "is_draft",
+        "author",
+        "username_lower",
+        "data",
+        # the content rendered as HTML by Albatross, if it's current
+        "rendered_html",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        summary: str | None,
+        content: str,
+        created_at: datetime,
+        slug: str,
+        is_draft: bool,
+        author: str,
+        username_lower: str,
+        data: tuple[ArticleDatum, ...] = (),
+        rendered_html: str | None = None,
+    ):
+        values = (
+            id,
+            title,
+            summary,
+            content,
+            created_at,
+            slug,
+            is_draft,
+            author,
+            username_lower,
+            tuple(ArticleDatum(*datum) for datum in data),
+            rendered_html,
+        )
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_article(
+        cls, article: Article, include_html: bool = False
+    ) -> "ArticleSnapshot":
+        """
+        Creates a snapshot of an Article.
+
+        Args:
+            article (Article): The article.
+            include_html (bool, optional): Whether or not to include the HTML
+            cached with the article (if it's current). Defaults to False.
+
+        Returns:
+            ArticleSnapshot: The snapshot of the article.
+        """
+        return cls(
+            id=article.id,
+            title=article.title,
+            summary=article.summary,
+            content=article.content,
+            created_at=article.created_at,
+            slug=article.slug,
+            is_draft=article.is_draft,
+            author=article.user.username,
+            username_lower=article.user.username_lower,
+            data=[(datum.key, datum.value) for datum in article.data],
+            rendered_html=(
+                current_html(
+                    article.content, article.rendered_html, article.rendered_fingerprint
+                )
+                if include_html
+                else None
+            ),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ArticleSnapshot):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self) -> str:
+        return f"<ArticleSnapshot(title='{self.title}', user='{self.author}')>"
+
+
+def as_snapshot(article: Article | ArticleSnapshot) -> ArticleSnapshot:
+    """
+    Gives the snapshot of an article, taking one if needed.
+
+    Args:
+        article (Article | ArticleSnapshot): The article (or its snapshot).
+
+    Returns:
+        ArticleSnapshot: The snapshot of the article.
+    """
+    if isinstance(article, ArticleSnapshot):
+        return article
+    return ArticleSnapshot.from_article(article)
@@ -4,20 +4,24 @@ from datetime import datetime as dt
 from pathlib import Path
 from random import choices
 from time import time
-from typing import Any
+from typing import Any, Iterable
 
 import jwt
-import mistune
 from flask import current_app
 from flask_login import UserMixin
-from pelican import read_settings
 from sqlalchemy import event
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session, mapped_column
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from app import db, login
-from app.helpers.articles import HighlightRenderer, generate_slug
-from app.helpers.settings import _default_settings_string, _write_dict_to_file
+from app.helpers import search
+from app.helpers.articles import content_fingerprint, generate_slug, render_markdown
+from app.helpers.settings import (
+    _default_settings_string,
+    _write_dict_to_file,
+    pelican_settings,
+)
 
 
 class User(UserMixin, db.Model):
@@ -35,6 +39,14 @@ class User(UserMixin, db.Model):
     about = db.Column(db.String(280), nullable=True)
     password_hash = db.Column(db.String(128))
     settings = db.relationship("UserSettings", uselist=False, backref="user")
+    # the counts of the user's articles, kept up to date as articles are
+    # written (see the Article events below) so they don't have to be loaded
+    # to count them
+    article_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    draft_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    published_count = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
 
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
@@ -59,26 +71,72 @@ class User(UserMixin, db.Model):
             return
         return db.session.get(User, user_id)
 
+    @property
+    def num_articles(self) -> int:
+        """
+        Returns the number of articles. The articles are only counted if
+        they're already loaded, otherwise their counter is used.
+
+        Returns:
+            int: the number of articles.
+        """
+        if "articles" in db.inspect(self).unloaded:
+            return self.article_count or 0
+        return len(self.articles)
+
     @property
     def num_drafts(self) -> int:
         """
-        Returns the number of articles that are marked as a draft.
+        Returns the number of articles that are marked as a draft. The articles
+        are only counted if they're already loaded, otherwise their counter is
+        used.
 
         Returns:
             int: the number of articles that are marked as a draft.
         """
+        if "articles" in db.inspect(self).unloaded:
+            return self.draft_count or 0
         return len([a for a in self.articles if a.is_draft])
 
     @property
     def num_published(self) -> int:
         """
-        Returns the number of articles that are marked as a draft.
+        Returns the number of articles that aren't marked as a draft. The
+        articles are only counted if they're already loaded, otherwise their
+        counter is used.
 
         Returns:
-            int: the number of articles that are marked as a draft.
+            int: the number of articles that aren't marked as a draft.
         """
+        if "articles" in db.inspect(self).unloaded:
+            return self.published_count or 0
         return len([a for a in self.articles if not a.is_draft])
 
+    @staticmethod
+    def recount_articles() -> None:
+        """
+        Recomputes the article counters of every user from their articles (in
+        a single UPDATE), e.g., after articles were written without going
+        through the ORM. The changes aren't committed.
+        """
+
+        def count(*criteria):
+            return (
+                db.select(db.func.count(Article.id))
+                .filter(Article.user_id == User.id, *criteria)
+                .scalar_subquery()
+            )
+
+        db.session.execute(
+            db.update(User).values(
+                article_count=count(),
+                draft_count=count(Article.is_draft.is_(True)),
+                published_count=count(Article.is_draft.is_(False)),
+                # recounting isn't an update of the profile
+                updated_at=User.updated_at,
+            )
+        )
+
     @staticmethod
     def is_username_taken(username: str) -> bool:
         """
@@ -113,23 +171,75 @@ class User(UserMixin, db.Model):
 
 article_data_association_table = db.Table(
     "article_data_association_table",
-    db.Column("articledata_id", db.ForeignKey("articles.id"), primary_key=True),
-    db.Column("article_id", db.ForeignKey("articledata.id"), primary_key=True),
+    db.Column("article_id", db.ForeignKey("articles.id"), primary_key=True),
+    # for finding the articles with some data (e.g., a tag)
+    db.Column("data_id", db.ForeignKey("articledata.id"), primary_key=True, index=True),
 )
 
 
 class ArticleData(db.Model):
-    # TODO: make it so that they key-value tuple is unique
+    # each (key, value) is stored once and shared by the articles that have it
+    # (see the before_flush event below)
     __tablename__ = "articledata"
+    __table_args__ = (
+        db.UniqueConstraint("key", "value", name="uq_articledata_key_value"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     key = db.Column(db.String(64), nullable=False)
     value = db.Column(db.String(256), nullable=False)
-    article_id = db.Column(db.Integer, db.ForeignKey("articles.id"))
     articles: Mapped[list["Article"]] = db.relationship(
         "Article", secondary=article_data_association_table, back_populates="data"
     )
 
+    @staticmethod
+    def upsert(pairs: Iterable[tuple[str, str]]) -> dict[tuple[str, str], int]:
+        """
+        Stores the (key, value) pairs that aren't stored yet, in a single
+        statement, and gives the ids of all of them. The changes aren't
+        committed.
+
+        Args:
+            pairs (Iterable[tuple[str, str]]): The (key, value) pairs.
+
+        Returns:
+            dict[tuple[str, str], int]: The id of each pair.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        db.session.execute(
+            _insert_ignoring_duplicates(ArticleData.__table__),
+            [{"key": key, "value": value} for key, value in pairs],
+        )
+        return _article_data_ids(pairs)
+
+    @staticmethod
+    def link(links: dict[int, Iterable[tuple[str, str]]]) -> None:
+        """
+        Adds data to articles in bulk: the data is upserted (see `upsert`) and
+        linked to the articles in a single statement, and the articles are
+        reindexed for search. The articles' data that's already loaded isn't
+        refreshed, and the changes aren't committed.
+
+        Args:
+            links (dict[int, Iterable[tuple[str, str]]]): The (key, value)
+            pairs to add to each article, keyed by the article's id.
+        """
+        links = {article_id: set(pairs) for article_id, pairs in links.items()}
+        ids = ArticleData.upsert(pair for pairs in links.values() for pair in pairs)
+        rows = [
+            {"article_id": article_id, "data_id": ids[pair]}
+            for article_id, pairs in links.items()
+            for pair in pairs
+        ]
+        if not rows:
+            return
+        db.session.execute(
+            _insert_ignoring_duplicates(article_data_association_table), rows
+        )
+        search.index_articles(db.session.connection(), links)
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -142,8 +252,33 @@ class ArticleData(db.Model):
         return f"<ArticleData(key='{self.key}', value='{self.value}')>"
 
 
+def _insert_ignoring_duplicates(table: db.Table):
+    """Gives an INSERT of the table's rows that skips the ones already stored"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return db.insert(table).prefix_with("IGNORE")
+
+
+def _article_data_ids(pairs: set[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """Gives the ids of the (key, value) pairs that are stored"""
+    rows = db.session.execute(
+        db.select(ArticleData.id, ArticleData.key, ArticleData.value).filter(
+            ArticleData.key.in_({key for key, _ in pairs}),
+            ArticleData.value.in_({value for _, value in pairs}),
+        )
+    )
+    return {(key, value): id for id, key, value in rows if (key, value) in pairs}
+
+
 class Article(db.Model):
     __tablename__ = "articles"
+    __table_args__ = (
+        # for paging through a user's articles (see the articles list)
+        db.Index("ix_articles_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title = db.Column(db.String, nullable=False)
@@ -153,10 +288,20 @@ class Article(db.Model):
     # updated_at = db.Column(db.DateTime, default=dt.utcnow, onupdate=dt.utcnow)
     updated_at = db.Column(db.DateTime, nullable=True, onupdate=dt.utcnow)
     image_url = db.Column(db.String)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    # the previous values of user_id and is_draft are loaded when they're
+    # changed, for updating the users' article counters
+    user_id = mapped_column(
+        db.Integer, db.ForeignKey("users.id"), nullable=True, active_history=True
+    )
     user = db.relationship("User")
     slug = db.Column(db.String, unique=True, name="uq_article_slug", index=True)
-    is_draft = db.Column(db.Boolean, default=True, nullable=False)
+    is_draft = mapped_column(
+        db.Boolean, default=True, nullable=False, active_history=True
+    )
+    # the content rendered as HTML and the fingerprint of the content (and
+    # renderer) it was rendered from
+    rendered_html = db.Column(db.Text, nullable=True)
+    rendered_fingerprint = db.Column(db.String(64), nullable=True)
 
     # Define many-to-many relationship with ArticleData
     data: Mapped[list[ArticleData]] = db.relationship(
@@ -193,22 +338,22 @@ class Article(db.Model):
 
     @property
     def content_html(self) -> str:
-        plugins = [
-            "abbr",
-            "def_list",
-            "footnotes",
-            # "insert",
-            # "mark",
-            # "math",
-            # "spoiler",
-            "strikethrough",
-            # "subscript",
-            # "superscript",
-            "table",
-            "task_lists",
-        ]
-        md = mistune.create_markdown(renderer=HighlightRenderer(), plugins=plugins)
-        return md(self.content)
+        return self.render()
+
+    def render(self) -> str:
+        """
+        Renders the content as HTML, unless the content (and the renderer)
+        haven't changed since it was last rendered.
+
+        Returns:
+            str: The rendered content.
+        """
+        content = self.content or ""
+        fingerprint = content_fingerprint(content)
+        if self.rendered_fingerprint != fingerprint:
+            self.rendered_html = render_markdown(content)
+            self.rendered_fingerprint = fingerprint
+        return self.rendered_html
 
     def __repr__(self) -> str:
         if not self.user:
@@ -277,7 +422,7 @@ class UserSettings(db.Model):
         Returns:
             Path: Path to the file
         """
-        return _write_dict_to_file(fname=fname, contents=read_settings())
+        return _write_dict_to_file(fname=fname, contents=pelican_settings())
 
     @staticmethod
     def _get_pelican_settings(
@@ -295,7 +440,7 @@ class UserSettings(db.Model):
         Returns:
             dict: Pelican's settings
         """
-        return read_settings(path=path, override=override)
+        return pelican_settings(path=path, override=override)
 
     def __eq__(self, other_settings: dict) -> bool:
         return self.to_dict() == other_settings
@@ -323,6 +468,141 @@ class UserSettings(db.Model):
         return json.dumps(self.to_dict(), sort_keys=True, indent=4)
 
 
+class CompileJob(db.Model):
+    __tablename__ = "compile_jobs"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
+    user = db.relationship("User")
+    status = db.Column(db.String(16), nullable=False, default=QUEUED, index=True)
+    created_at = db.Column(db.DateTime, default=dt.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    artifact_path = db.Column(db.String, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    # timing of the stages of the compile (see app.main.report.CompileReport)
+    report = db.Column(db.JSON, nullable=True)
+    # the `flask albatross compile-all` run that queued the job, if any
+    batch = db.Column(db.String(32), nullable=True, index=True)
+    # held by the user's queued or running job, so that a user only has one
+    # compile in flight at a time (see app.main.jobs.enqueue_compile)
+    lease = db.Column(db.String(64), nullable=True, index=True, unique=True)
+
+    @staticmethod
+    def lease_for(user_id: int) -> str:
+        """
+        Gives the lease of a user's in-flight compile.
+
+        Args:
+            user_id (int): The id of the user.
+
+        Returns:
+            str: The lease.
+        """
+        return f"user-{user_id}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (CompileJob.SUCCEEDED, CompileJob.FAILED)
+
+    def succeed(self, artifact_path: Path | str) -> "CompileJob":
+        """
+        Marks the job as succeeded.
+
+        Args:
+            artifact_path (Path | str): Path to the compiled site.
+
+        Returns:
+            CompileJob: the job
+        """
+        self.status = CompileJob.SUCCEEDED
+        self.artifact_path = str(artifact_path)
+        self.finished_at = dt.utcnow()
+        self.lease = None
+        return self
+
+    @property
+    def is_expired(self) -> bool:
+        return self.status == CompileJob.SUCCEEDED and self.artifact_path is None
+
+    def expire(self) -> "CompileJob":
+        """
+        Marks the job's compiled site as removed (by the garbage collector).
+
+        Returns:
+            CompileJob: the job
+        """
+        self.artifact_path = None
+        return self
+
+    def fail(self, error: str) -> "CompileJob":
+        """
+        Marks the job as failed.
+
+        Args:
+            error (str): Why the job failed.
+
+        Returns:
+            CompileJob: the job
+        """
+        self.status = CompileJob.FAILED
+        self.error = error
+        self.finished_at = dt.utcnow()
+        self.lease = None
+        return self
+
+    @staticmethod
+    def claim_next() -> int | None:
+        """
+        Claims the oldest queued job by marking it as running. The status is
+        checked again in the update, so two workers can't claim the same job.
+
+        Returns:
+            int | None: The id of the claimed job, or None if there are no
+            queued jobs.
+        """
+        while True:
+            job_id = db.session.scalar(
+                db.select(CompileJob.id)
+                .filter_by(status=CompileJob.QUEUED)
+                .order_by(CompileJob.id)
+                .limit(1)
+            )
+            if job_id is None:
+                db.session.commit()
+                return None
+
+            result = db.session.execute(
+                db.update(CompileJob)
+                .where(CompileJob.id == job_id, CompileJob.status == CompileJob.QUEUED)
+                .values(status=CompileJob.RUNNING, started_at=dt.utcnow())
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                return job_id
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "expired": self.is_expired,
+        }
+
+    def __repr__(self) -> str:
+        return f"<CompileJob(id={self.id}, status='{self.status}')>"
+
+
 # Define an event listener to generate slug before insert
 @event.listens_for(Article, "before_insert")
 def generate_slug_before_insert(mapper, connection, target):
@@ -336,6 +616,126 @@ def generate_slug_before_insert(mapper, connection, target):
     target.slug = slug
 
 
+def _count_articles(connection, user_id: int | None, is_draft: bool, sign: int):
+    """Adds an article to (or, with a sign of -1, removes it from) the counts"""
+    if user_id is None:
+        return
+    connection.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(
+            article_count=User.article_count + sign,
+            draft_count=User.draft_count + (sign if is_draft else 0),
+            published_count=User.published_count + (0 if is_draft else sign),
+            # counting isn't an update of the profile
+            updated_at=User.updated_at,
+        )
+    )
+
+
+def _committed_value(target, name: str):
+    """Returns the value of an attribute before the flush"""
+    history = db.inspect(target).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, name)
+
+
+# Define event listeners to keep the users' article counters up to date
+@event.listens_for(Article, "after_insert")
+def count_article_after_insert(mapper, connection, target):
+    _count_articles(connection, target.user_id, target.is_draft, 1)
+
+
+@event.listens_for(Article, "after_update")
+def count_article_after_update(mapper, connection, target):
+    user_id = _committed_value(target, "user_id")
+    is_draft = _committed_value(target, "is_draft")
+    if (user_id, is_draft) != (target.user_id, target.is_draft):
+        _count_articles(connection, user_id, is_draft, -1)
+        _count_articles(connection, target.user_id, target.is_draft, 1)
+
+
+@event.listens_for(Article, "after_delete")
+def count_article_after_delete(mapper, connection, target):
+    _count_articles(
+        connection,
+        _committed_value(target, "user_id"),
+        _committed_value(target, "is_draft"),
+        -1,
+    )
+
+
+# Define an event listener to render the content as it's written, so it isn't
+# rendered when the article is viewed
+@event.listens_for(Article, "before_insert")
+@event.listens_for(Article, "before_update")
+def render_content_before_write(mapper, connection, target):
+    target.render()
+
+
+# Define an event listener to keep the search index in sync with the articles
+# (and the data of the articles) that were written. The index is updated after
+# the flush, once the articles' data is associated with them.
+@event.listens_for(Session, "after_flush")
+def index_articles_after_flush(session, flush_context):
+    written, data = set(), set()
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Article):
+            written.add(obj.id)
+        elif isinstance(obj, ArticleData):
+            data.add(obj.id)
+    deleted = set()
+    for obj in session.deleted:
+        if isinstance(obj, Article):
+            deleted.add(obj.id)
+        elif isinstance(obj, ArticleData):
+            # its association with the articles is already gone
+            written.update(article.id for article in obj.__dict__.get("articles", ()))
+    if not (written or data or deleted):
+        return
+
+    connection = session.connection()
+    written |= search.articles_with_data(connection, data)
+    search.unindex_articles(connection, deleted)
+    search.index_articles(connection, written - deleted)
+
+
+# Define an event listener to store each (key, value) of the articles' data
+# once: new data that's already stored (or added more than once) is replaced
+# with the data that's stored
+@event.listens_for(Session, "before_flush")
+def dedupe_article_data_before_flush(session, flush_context, instances):
+    pending = [obj for obj in session.new if isinstance(obj, ArticleData)]
+    if not pending:
+        return
+    with session.no_autoflush:
+        ids = _article_data_ids({(datum.key, datum.value) for datum in pending})
+        stored = {pair: session.get(ArticleData, id) for pair, id in ids.items()}
+        for datum in pending:
+            kept = stored.setdefault((datum.key, datum.value), datum)
+            if kept is datum:
+                continue
+            for article in list(datum.articles):
+                if kept in article.data:
+                    article.data.remove(datum)
+                else:
+                    article.data[article.data.index(datum)] = kept
+            session.expunge(datum)
+
+
+# Define event listeners to create (and drop) the search index along with the
+# tables
+@event.listens_for(db.metadata, "after_create")
+def create_search_index_after_create(target, connection, **kw):
+    search.create_search_index(connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def drop_search_index_before_drop(target, connection, **kw):
+    search.drop_search_index(connection)
+
+
 # Define an event listener to generate slug before update
 # @event.listens_for(Article, "before_update")
 # def generate_slug_before_update(mapper, connection, target):
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from typing import Any, Callable
 
@@ -40,6 +41,12 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = env_var("TRACK_MODIFICATIONS", False)
     BOOTSTRAP_BOOTSWATCH_THEME = "litera"
     ARTICLES_PER_PAGE = env_var("ARTICLES_PER_PAGE", 25)
+    # the endpoints whose pages are streamed as they're rendered
+    STREAMED_ENDPOINTS = env_var(
+        "STREAMED_ENDPOINTS",
+        "articles.article,articles.articles",
+        type=lambda endpoints: set(filter(None, endpoints.split(","))),
+    )
     ADMINS = env_var("ADMINS", ["albatross@example.com"])
     # TODO: more MDEditor settings
     MDEDITOR_LANGUAGE = env_var("MDEDITOR_LANGUAGE", "en")
@@ -49,6 +56,34 @@ class Config:
     MAX_CONTENT_LENGTH = env_var("MAX_CONTENT_LENGTH", 16 * 1_000 * 1_000, type=int)
     UPLOAD_FOLDER = env_var("UPLOAD_FOLDER", Path(base_dir).parent / "uploads")
     UPLOAD_EXTENSIONS = [".json"]
+    BUILD_FOLDER = env_var("BUILD_FOLDER", Path(base_dir).parent / "builds")
+    COMPILE_IN_MEMORY: bool = env_var("COMPILE_IN_MEMORY", "true").lower() == "true"
+    # give Pelican the articles' HTML rendered by Albatross instead of having it
+    # convert their Markdown (only when compiling in memory)
+    COMPILE_PRERENDERED: bool = (
+        env_var("COMPILE_PRERENDERED", "false").lower() == "true"
+    )
+    COMPILE_DRAFTS: bool = env_var("COMPILE_DRAFTS", "true").lower() == "true"
+    # a RAM-backed directory (e.g., /dev/shm/albatross) to build sites in
+    # instead of BUILD_FOLDER, for sites whose articles fit in
+    # COMPILE_SCRATCH_MAX_BYTES
+    COMPILE_SCRATCH_FOLDER = env_var("COMPILE_SCRATCH_FOLDER", None)
+    COMPILE_SCRATCH_MAX_BYTES = env_var(
+        "COMPILE_SCRATCH_MAX_BYTES", 50 * 1_000 * 1_000, type=int
+    )
+    ARCHIVE_COMPRESSION_LEVEL = env_var("ARCHIVE_COMPRESSION_LEVEL", 6, type=int)
+    # bytes of compiled sites to keep around for reuse
+    ARTIFACT_CACHE_QUOTA = env_var(
+        "ARTIFACT_CACHE_QUOTA", 1_000 * 1_000 * 1_000, type=int
+    )
+    # seconds a compile can run before a new one for the same user replaces it
+    COMPILE_LEASE_TIMEOUT = env_var("COMPILE_LEASE_TIMEOUT", 60 * 60, type=int)
+    # builds of each user whose sites are kept by `flask albatross gc`
+    ARTIFACT_KEEP_BUILDS = env_var("ARTIFACT_KEEP_BUILDS", 5, type=int)
+    BUILDS_PER_PAGE = env_var("BUILDS_PER_PAGE", 25, type=int)
+    # a worker is replaced after this many jobs or once it uses this many bytes
+    WORKER_MAX_BUILDS = env_var("WORKER_MAX_BUILDS", 100, type=int)
+    WORKER_MAX_MEMORY = env_var("WORKER_MAX_MEMORY", 500 * 1_000 * 1_000, type=int)
 
 
 class TestConfig(Config):
@@ -59,3 +94,4 @@ class TestConfig(Config):
     SERVER_NAME = "localhost.localdomain"
     WTF_CSRF_ENABLED = False
     ARTICLES_PER_PAGE = 10
+    BUILD_FOLDER = Path(tempfile.gettempdir()) / "albatross-test-builds"
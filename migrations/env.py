@@ -50,6 +50,13 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_name(name, type_, parent_names):
+    # the search index (see app.helpers.search) isn't in the metadata
+    if type_ == "table":
+        return not name.startswith(("articles_fts", "article_search"))
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -94,6 +101,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_name=include_name,
             **current_app.extensions["migrate"].configure_args
         )
 
@@ -0,0 +1,94 @@
+"""article search index
+
+Revision ID: 2374d2c55cd7
+Revises: 46ca9645e5fe
+Create Date: 2026-10-18 19:02:13.408210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "2374d2c55cd7"
+down_revision = "46ca9645e5fe"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the index isn't in the models' metadata (see app.helpers.search)
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE articles_fts "
+            "USING fts5(title, summary, content, keywords)"
+        )
+        # index the existing articles
+        op.execute(
+            """
+            INSERT INTO articles_fts (rowid, title, summary, content, keywords)
+            SELECT
+                articles.id,
+                articles.title,
+                coalesce(articles.summary, ''),
+                articles.content,
+                coalesce((
+                    SELECT group_concat(articledata.value, ' ')
+                    FROM articledata
+                    JOIN article_data_association_table AS association
+                        ON association.article_id = articledata.id
+                    WHERE association.articledata_id = articles.id
+                        AND articledata.key IN ('keyword', 'keywords', 'tags')
+                ), '')
+            FROM articles
+            """
+        )
+    elif dialect == "postgresql":
+        op.create_table(
+            "article_search",
+            sa.Column("article_id", sa.Integer(), nullable=False),
+            sa.Column("document", postgresql.TSVECTOR(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["article_id"], ["articles.id"], ondelete="CASCADE"
+            ),
+            sa.PrimaryKeyConstraint("article_id"),
+        )
+        op.create_index(
+            "ix_article_search_document",
+            "article_search",
+            ["document"],
+            postgresql_using="gin",
+        )
+        # index the existing articles
+        op.execute(
+            """
+            INSERT INTO article_search (article_id, document)
+            SELECT
+                articles.id,
+                setweight(to_tsvector('english', articles.title), 'A')
+                || setweight(to_tsvector('english', coalesce((
+                    SELECT string_agg(articledata.value, ' ')
+                    FROM articledata
+                    JOIN article_data_association_table AS association
+                        ON association.article_id = articledata.id
+                    WHERE association.articledata_id = articles.id
+                        AND articledata.key IN ('keyword', 'keywords', 'tags')
+                ), '')), 'B')
+                || setweight(
+                    to_tsvector('english', coalesce(articles.summary, '')), 'B'
+                )
+                || setweight(to_tsvector('english', articles.content), 'C')
+            FROM articles
+            """
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute("DROP TABLE articles_fts")
+    elif dialect == "postgresql":
+        op.drop_index("ix_article_search_document", table_name="article_search")
+        op.drop_table("article_search")
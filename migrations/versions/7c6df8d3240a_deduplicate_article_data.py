@@ -0,0 +1,95 @@
+"""deduplicate article data
+
+Revision ID: 7c6df8d3240a
+Revises: 2374d2c55cd7
+Create Date: 2026-10-18 19:41:27.650218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7c6df8d3240a"
+down_revision = "2374d2c55cd7"
+branch_labels = None
+depends_on = None
+
+
+# the id of the row each (key, value) of the data is kept in
+KEPT = "SELECT min(id) AS id, key, value FROM articledata GROUP BY key, value"
+
+
+def upgrade():
+    # the articles are linked to the data that's kept, through a new association
+    # whose columns are named after what they refer to (they were swapped)
+    op.create_table(
+        "article_data_links",
+        sa.Column("article_id", sa.Integer(), nullable=False),
+        sa.Column("data_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"]),
+        sa.ForeignKeyConstraint(["data_id"], ["articledata.id"]),
+        sa.PrimaryKeyConstraint("article_id", "data_id"),
+    )
+    op.execute(
+        f"""
+        INSERT INTO article_data_links (article_id, data_id)
+        SELECT association.articledata_id, kept.id
+        FROM article_data_association_table AS association
+        JOIN articledata ON articledata.id = association.article_id
+        JOIN ({KEPT}) AS kept
+            ON kept.key = articledata.key AND kept.value = articledata.value
+        UNION
+        SELECT articledata.article_id, kept.id
+        FROM articledata
+        JOIN articles ON articles.id = articledata.article_id
+        JOIN ({KEPT}) AS kept
+            ON kept.key = articledata.key AND kept.value = articledata.value
+        """
+    )
+    op.drop_table("article_data_association_table")
+    op.rename_table("article_data_links", "article_data_association_table")
+    op.create_index(
+        "ix_article_data_association_table_data_id",
+        "article_data_association_table",
+        ["data_id"],
+        unique=False,
+    )
+
+    op.execute(
+        f"DELETE FROM articledata WHERE id NOT IN (SELECT id FROM ({KEPT}) AS kept)"
+    )
+    with op.batch_alter_table("articledata", schema=None) as batch_op:
+        batch_op.drop_column("article_id")
+        batch_op.create_unique_constraint("uq_articledata_key_value", ["key", "value"])
+
+
+def downgrade():
+    # the data stays deduplicated
+    with op.batch_alter_table("articledata", schema=None) as batch_op:
+        batch_op.drop_constraint("uq_articledata_key_value", type_="unique")
+        batch_op.add_column(sa.Column("article_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_articledata_article_id", "articles", ["article_id"], ["id"]
+        )
+
+    op.create_table(
+        "article_data_links",
+        sa.Column("articledata_id", sa.Integer(), nullable=False),
+        sa.Column("article_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["article_id"], ["articledata.id"]),
+        sa.ForeignKeyConstraint(["articledata_id"], ["articles.id"]),
+        sa.PrimaryKeyConstraint("articledata_id", "article_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO article_data_links (articledata_id, article_id)
+        SELECT article_id, data_id FROM article_data_association_table
+        """
+    )
+    op.drop_index(
+        "ix_article_data_association_table_data_id",
+        table_name="article_data_association_table",
+    )
+    op.drop_table("article_data_association_table")
+    op.rename_table("article_data_links", "article_data_association_table")
@@ -233,10 +233,14 @@ articles = [
 with open("/usr/share/dict/words", "r") as f:
     words = random.sample([line for line in f.read().split("\n")], k=25)
 
-keywords = [models.ArticleData(key="keyword", value=word) for word in words]
-
-for article in articles:
-    article.data = random.sample(keywords, k=5)
-
 db.session.add_all(articles)
+db.session.flush()
+
+# each keyword is stored once, and linked to the articles in bulk
+models.ArticleData.link(
+    {
+        article.id: [("keyword", word) for word in random.sample(words, k=5)]
+        for article in articles
+    }
+)
 db.session.commit()
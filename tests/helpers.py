@@ -1,3 +1,6 @@
+from sqlalchemy import event
+
+
 class AuthActions:
     """Authentication helper class. Adapted from:
     https://flask.palletsprojects.com/en/2.2.x/tutorial/tests/#authentication
@@ -20,3 +23,21 @@ class AuthActions:
 
     def logout(self):
         return self._client.get("/auth/logout")
+
+
+class QueryCounter:
+    """Context manager that counts the SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self._engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self._engine, "before_cursor_execute", self._count)
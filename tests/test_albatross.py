@@ -3,17 +3,34 @@ from pathlib import Path
 import shutil
 from unittest.mock import MagicMock, patch
 
+import pytest
+from jinja2 import Environment
 from pelican import read_settings
 
-from app import models
+from app import db, models
+from app.helpers.settings import pelican_settings
 from app.jinja.filters import datetime_format
 from app.main.albatross import (
+    artifact_key,
     article_to_post,
+    compile_articles,
     compile_posts,
     create_post,
+    create_post_files,
+    create_posts,
+    sync_posts,
     _create_metadata,
     _output_path,
+    _post_file_name,
+    _template_cache,
+    _theme_fingerprint,
 )
+from app.main.artifacts import ArtifactCache
+from app.main.manifest import MANIFEST_NAME, BuildManifest
+from app.main.reader import POSTS_SETTING, AlbatrossReader
+from app.main.report import CompileReport
+from app.main.snapshot import ArticleSnapshot
+from tests.helpers import QueryCounter
 
 
 def test_create_post(tmpdir):
@@ -53,8 +70,9 @@ def test_create_post_metadata(tmpdir):
     post_content += "\n".join([f"{key}: {value}" for key, value in metadata.items()])
     post_content += f"\n---\n\n{content}"
 
-    assert post_path.name[-3:] == ".md"
+    assert post_path.name == "test-slug.md"
     assert post_content == post_path.read_text()
+    assert create_post(content, metadata, tmpdir) == post_path
 
 
 def test_article_to_post(session, tmpdir):
@@ -164,7 +182,7 @@ translation: False
     assert post_content == post_path.read_text()
 
 
-def test_compile_posts_compiles_correctly(session):
+def test_compile_posts_compiles_correctly(session, tmp_path):
     user = session.get(models.User, 1)
     articles = [
         models.Article(title=f"Article {i}", content=f"Content {1}", user=user)
@@ -182,19 +200,7 @@ def test_compile_posts_compiles_correctly(session):
     session.add_all(articles)
     session.commit()
 
-    output_dir = Path(compile_posts(articles=articles, directory=None, cleanup=False))
-    suffix = output_dir.suffix
-    # compile posts returns the path to the archived version of the compiled site.
-    # to get the actual directory, remove the suffix from the filename and we have
-    # the path to the output directory
-    output_dir = Path(
-        "/".join(
-            [
-                part if not suffix in part else part.replace(suffix, "")
-                for part in output_dir._cparts
-            ]
-        )
-    )
+    output_dir = compile_posts(articles=articles, directory=tmp_path)
     # check that the proper articles were generated
     # - articles marked as "draft" should be in the ./output/drafts directory
     # - articles not marked as "draft" should be in the
@@ -209,7 +215,7 @@ def test_compile_posts_compiles_correctly(session):
     shutil.rmtree(output_dir)
 
 
-def test_compile_posts_creates_temporary_directory(session):
+def test_compile_posts_creates_build_directory(session, tmp_path):
     user = session.get(models.User, 1)
     articles = [
         models.Article(title=f"Article {i}", content=f"Content {1}", user=user)
@@ -223,24 +229,123 @@ def test_compile_posts_creates_temporary_directory(session):
     session.add_all(articles)
     session.commit()
 
-    with patch(
-        "app.main.albatross.tempfile.TemporaryDirectory"
-    ) as mock_temp_dir, patch(
-        "app.main.albatross.article_to_post"
-    ) as mock_article_to_post:
-        output_file = compile_posts(articles=articles)
+    with patch("app.main.albatross.pelican.Pelican.run"):
+        output_dir = compile_posts(articles=articles, directory=tmp_path)
 
-    # clean up
+    build_path = tmp_path / user.username_lower
+    assert output_dir.parent == build_path
+    assert (build_path / MANIFEST_NAME).exists()
     for article in articles:
-        post_file = Path(f"{article.slug}.md")
-        if post_file.exists():
-            post_file.unlink()
+        assert (build_path / "content" / _post_file_name(article)).exists()
+
+
+def test_compile_posts_only_rewrites_changed_articles(session, tmp_path):
+    user = session.get(models.User, 1)
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    session.add_all(articles)
+    session.commit()
+
+    content_path = tmp_path / "content"
+    content_path.mkdir()
+    manifest = BuildManifest(tmp_path / MANIFEST_NAME)
+    written = sync_posts(articles=articles, base_dir=content_path, manifest=manifest)
+    assert len(written) == len(articles)
+
+    # nothing changed, so nothing is written
+    written = sync_posts(articles=articles, base_dir=content_path, manifest=manifest)
+    assert written == []
+
+    articles[1].content = "New content"
+    session.commit()
+    written = sync_posts(articles=articles, base_dir=content_path, manifest=manifest)
+    assert written == [content_path / _post_file_name(articles[1])]
+    assert "New content" in written[0].read_text()
+
+
+def test_compile_posts_removes_deleted_articles(session, tmp_path):
+    user = session.get(models.User, 1)
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    session.add_all(articles)
+    session.commit()
+
+    content_path = tmp_path / "content"
+    content_path.mkdir()
+    manifest = BuildManifest(tmp_path / MANIFEST_NAME)
+    sync_posts(articles=articles, base_dir=content_path, manifest=manifest)
+
+    removed = articles.pop()
+    written = sync_posts(articles=articles, base_dir=content_path, manifest=manifest)
+    assert written == []
+    assert not (content_path / _post_file_name(removed)).exists()
+    assert str(removed.id) not in manifest.articles
+
+
+def test_compile_posts_starts_over_when_settings_change(session, tmp_path):
+    user = session.get(models.User, 1)
+    article = models.Article(title="Article", content="Content", user=user)
+    session.add(article)
+    session.commit()
+
+    with patch("app.main.albatross.pelican.Pelican.run"):
+        compile_posts(articles=[article], directory=tmp_path)
+
+    build_path = tmp_path / user.username_lower
+    stale_post = build_path / "content" / "stale.md"
+    stale_post.write_text("stale")
+
+    manifest = BuildManifest.load(build_path / MANIFEST_NAME)
+    manifest.settings_hash = "outdated"
+    manifest.save()
+
+    with patch("app.main.albatross.pelican.Pelican.run"):
+        compile_posts(articles=[article], directory=tmp_path)
+
+    assert not stale_post.exists()
+    assert (build_path / "content" / _post_file_name(article)).exists()
+
+
+def test_compile_posts_starts_over_when_theme_changes(session, tmp_path):
+    user = session.get(models.User, 1)
+    article = models.Article(title="Article", content="Content", user=user)
+    session.add(article)
+    session.commit()
+
+    with patch("app.main.albatross.pelican.Pelican.run"):
+        compile_posts(articles=[article], directory=tmp_path)
+    build_path = tmp_path / user.username_lower
+    (build_path / "cache" / "stale").mkdir(parents=True)
+
+    with patch("app.main.albatross.pelican.Pelican.run"), patch(
+        "app.main.albatross._theme_fingerprint", return_value="new theme"
+    ):
+        compile_posts(articles=[article], directory=tmp_path)
 
-    Path(output_file).unlink()
-    assert mock_temp_dir.called_once_with(prefix="content", dir=None)
+    assert not (build_path / "cache" / "stale").exists()
+    assert (build_path / "content" / _post_file_name(article)).exists()
 
 
-def test_compile_posts_runs_pelican(session):
+def test_post_file_names_are_derived_from_slugs(session, tmp_path, user):
+    article = models.Article(title="A Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+
+    with patch("app.main.albatross.pelican.Pelican.run"):
+        compile_posts(articles=[article], directory=tmp_path)
+
+    content_path = tmp_path / user.username_lower / "content"
+    assert [path.name for path in content_path.iterdir()] == [f"{article.slug}.md"]
+    assert _post_file_name(article, extension="albatross") == (
+        f"{article.slug}.albatross"
+    )
+
+
+def test_compile_posts_runs_pelican(session, tmp_path):
     user = session.get(models.User, 1)
     articles = [
         models.Article(title=f"Article {i}", content=f"Content {1}", user=user)
@@ -254,12 +359,9 @@ def test_compile_posts_runs_pelican(session):
     session.add_all(articles)
     session.commit()
 
-    with patch("app.main.albatross.pelican.Pelican.run") as mock_pelican_run, patch(
-        "shutil.make_archive"
-    ) as mock_make_archive, patch("shutil.rmtree") as mock_rmtree:
+    with patch("app.main.albatross.pelican.Pelican.run") as mock_pelican_run:
         mock_pelican_run.return_value = MagicMock()
-        mock_make_archive.return_value = MagicMock()
-        compile_posts(articles=articles, directory=None)
+        compile_posts(articles=articles, directory=tmp_path)
 
     # clean up
     for article in articles:
@@ -270,6 +372,285 @@ def test_compile_posts_runs_pelican(session):
     assert mock_pelican_run.called
 
 
+def test_compile_posts_in_memory(session, tmp_path):
+    user = session.get(models.User, 1)
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    articles[0].is_draft = False
+    articles[0].data = [
+        models.ArticleData(key="tags", value="til"),
+        models.ArticleData(key="category", value="helpful"),
+    ]
+    session.add_all(articles)
+    session.commit()
+
+    output_dir = compile_posts(articles=articles, directory=tmp_path, in_memory=True)
+
+    # no Markdown files are written
+    assert not list((tmp_path / user.username_lower / "content").iterdir())
+    published = output_dir / f"{articles[0].slug}.html"
+    assert published.exists()
+    assert "<p>Content 0</p>" in published.read_text()
+    assert (output_dir / "tag" / "til.html").exists()
+    assert (output_dir / "category" / "helpful.html").exists()
+    for article in articles[1:]:
+        assert (output_dir / "drafts" / f"{article.slug}.html").exists()
+
+
+def test_compile_posts_with_prerendered_html(session, tmp_path, user):
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(2)
+    ]
+    session.add_all(articles)
+    session.commit()
+    # the HTML rendered by Albatross is used as is, stale HTML isn't (written
+    # directly, since writing an article renders it)
+    for article, values in (
+        (articles[0], {"rendered_html": "<p>Prerendered 0</p>"}),
+        (articles[1], {"rendered_html": "<p>Stale 1</p>", "rendered_fingerprint": ""}),
+    ):
+        session.execute(
+            db.update(models.Article).filter_by(id=article.id).values(**values)
+        )
+    session.commit()
+    snapshots = compile_articles(user.id, include_html=True)
+
+    report = CompileReport()
+    with patch("app.main.reader.Markdown.convert", autospec=True) as mock_convert:
+        mock_convert.side_effect = lambda md, text: f"<p>{text}</p>"
+        output_dir = compile_posts(
+            articles=snapshots,
+            directory=tmp_path,
+            in_memory=True,
+            report=report,
+            prerendered=True,
+        )
+
+    converted = [call.args[1] for call in mock_convert.call_args_list]
+    assert "Content 0" not in converted
+    assert "Content 1" in converted
+    assert report.counts["prerendered"] == 1
+    drafts = output_dir / "drafts"
+    assert "Prerendered 0" in (drafts / f"{articles[0].slug}.html").read_text()
+    assert "Content 1" in (drafts / f"{articles[1].slug}.html").read_text()
+
+
+def test_create_posts_with_prerendered_html(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+    snapshot = ArticleSnapshot.from_article(article, include_html=True)
+
+    (markdown_post,) = create_posts([snapshot]).values()
+    (post,) = create_posts([snapshot], prerendered=True).values()
+
+    assert markdown_post.html is None
+    assert post.html == "<p>Content</p>\n"
+    # the HTML goes into the site, so the post changes with it
+    assert post.digest != markdown_post.digest
+
+
+def test_compile_posts_in_memory_only_reads_changed_posts(session, tmp_path):
+    user = session.get(models.User, 1)
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    session.add_all(articles)
+    session.commit()
+
+    compile_posts(articles=articles, directory=tmp_path, in_memory=True)
+
+    articles[0].content = "New content"
+    session.commit()
+    with patch.object(
+        AlbatrossReader, "read", autospec=True, side_effect=AlbatrossReader.read
+    ) as mock_read:
+        output_dir = compile_posts(
+            articles=articles, directory=tmp_path, in_memory=True
+        )
+
+    assert mock_read.call_count == 1
+    assert (
+        "New content"
+        in (output_dir / "drafts" / f"{articles[0].slug}.html").read_text()
+    )
+
+
+def test_compile_posts_reuses_cached_sites(session, tmp_path):
+    user = session.get(models.User, 1)
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    session.add_all(articles)
+    session.commit()
+    artifacts = ArtifactCache(tmp_path / "artifacts")
+
+    output_dir = compile_posts(
+        articles=articles, directory=tmp_path, in_memory=True, artifacts=artifacts
+    )
+    with patch("app.main.albatross.AlbatrossPelican") as mock_pelican:
+        cached_dir = compile_posts(
+            articles=articles, directory=tmp_path, in_memory=True, artifacts=artifacts
+        )
+
+    mock_pelican.assert_not_called()
+    assert cached_dir == output_dir
+    assert output_dir.parent.parent == artifacts.root
+    assert (output_dir / "drafts" / f"{articles[0].slug}.html").exists()
+
+    articles[0].content = "New content"
+    session.commit()
+    changed_dir = compile_posts(
+        articles=articles, directory=tmp_path, in_memory=True, artifacts=artifacts
+    )
+
+    assert changed_dir != output_dir
+    assert (
+        "New content"
+        in (changed_dir / "drafts" / f"{articles[0].slug}.html").read_text()
+    )
+    assert len(artifacts.artifacts()) == 2
+
+
+def _digests(articles):
+    return {
+        post.file_name: post.digest for post in create_post_files(articles).values()
+    }
+
+
+def test_artifact_key(session, tmp_path, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+    theme = tmp_path / "theme"
+    theme.mkdir()
+    (theme / "base.html").write_text("base")
+    fingerprint = _theme_fingerprint(str(theme))
+    digests = _digests([article])
+
+    key = artifact_key(digests, "settings", fingerprint, in_memory=True)
+
+    assert key == artifact_key(digests, "settings", fingerprint, in_memory=True)
+    assert key != artifact_key(digests, "other settings", fingerprint, in_memory=True)
+    assert key != artifact_key(digests, "settings", fingerprint, in_memory=False)
+    article.content = "New content"
+    session.commit()
+    assert key != artifact_key(
+        _digests([article]), "settings", fingerprint, in_memory=True
+    )
+    (theme / "base.html").write_text("new base")
+    assert key != artifact_key(
+        digests, "settings", _theme_fingerprint(str(theme)), in_memory=True
+    )
+
+
+def test_compile_posts_creates_each_post_once(session, tmp_path, user):
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(3)
+    ]
+    session.add_all(articles)
+    session.commit()
+    artifacts = ArtifactCache(tmp_path / "artifacts")
+
+    with patch(
+        "app.main.albatross._create_metadata", wraps=_create_metadata
+    ) as mock_metadata, patch("app.main.albatross.pelican.Pelican"):
+        compile_posts(articles=articles, directory=tmp_path, artifacts=artifacts)
+
+    assert mock_metadata.call_count == len(articles)
+
+
+def test_reader_without_the_meta_extension(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+    posts = create_posts([article])
+    settings = pelican_settings()
+    settings["MARKDOWN"]["extensions"] = []
+    settings[POSTS_SETTING] = posts
+    reader = AlbatrossReader(settings)
+
+    content, metadata = reader.read(next(iter(posts)))
+
+    assert content == "<p>Content</p>"
+    assert metadata["title"] == "Title"
+
+
+def test_create_posts(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    article.data = [models.ArticleData(key="keywords", value="test")]
+    session.add(article)
+    session.commit()
+
+    posts = create_posts([article])
+
+    post = posts[_post_file_name(article, extension="albatross")]
+    assert post.content == article.content
+    assert post.metadata["date"] == article.created_at
+    assert post.metadata["keywords"] == {"test"}
+    assert create_posts([article]) == posts
+
+
+@pytest.mark.parametrize("num_articles", [1, 30])
+def test_compile_articles_uses_a_fixed_number_of_queries(
+    app, session, user, num_articles
+):
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(num_articles)
+    ]
+    for i, article in enumerate(articles):
+        article.data = [
+            models.ArticleData(key="keywords", value=f"test_{i}_{j}") for j in range(3)
+        ]
+    session.add_all(articles)
+    session.commit()
+    user_id = user.id
+    session.expunge_all()
+
+    with QueryCounter(db.engine) as counter:
+        loaded = compile_articles(user_id)
+        create_posts(loaded)
+        for article in loaded:
+            _create_metadata(article)
+
+    assert counter.count == 2
+    assert len(loaded) == num_articles
+    assert all(len(article.data) == 3 for article in loaded)
+
+
+def test_compile_articles_can_leave_out_drafts(session, user):
+    articles = [
+        models.Article(title=f"Article {i}", content=f"Content {i}", user=user)
+        for i in range(4)
+    ]
+    articles[1].is_draft = False
+    session.add_all(articles)
+    session.commit()
+
+    snapshots = [ArticleSnapshot.from_article(article) for article in articles]
+    assert compile_articles(user.id) == snapshots
+    assert compile_articles(user.id, include_drafts=False) == [snapshots[1]]
+
+
+def test_compile_articles_can_include_the_cached_html(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+
+    (snapshot,) = compile_articles(user.id, include_html=True)
+
+    assert snapshot == ArticleSnapshot.from_article(article, include_html=True)
+    assert snapshot.rendered_html == article.rendered_html
+    assert compile_articles(user.id)[0].rendered_html is None
+
+
 def test_create_metadata_function(session, user):
     article = models.Article(
         title="Article Title",
@@ -311,6 +692,21 @@ def test_output_path_function(article):
     assert f"{username}-this-should-be-part-of-the-path-output" in output_path
 
 
+def test_compile_posts_reuses_compiled_templates(session, tmp_path, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+    _template_cache.clear()
+
+    compile_posts(articles=[article], directory=tmp_path, in_memory=True)
+    with patch.object(
+        Environment, "compile", autospec=True, side_effect=Environment.compile
+    ) as mock_compile:
+        compile_posts(articles=[article], directory=tmp_path, in_memory=True)
+
+    mock_compile.assert_not_called()
+
+
 if __name__ == "__main__":
     import pytest
 
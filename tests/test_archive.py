@@ -0,0 +1,48 @@
+import io
+import zipfile
+
+import pytest
+
+from app.main.archive import stream_archive
+
+
+@pytest.fixture
+def site(tmp_path):
+    site = tmp_path / "output"
+    (site / "drafts").mkdir(parents=True)
+    (site / "index.html").write_text("<h1>Index</h1>" * 100)
+    (site / "drafts" / "draft.html").write_text("<p>Draft</p>")
+    (site / "image.bin").write_bytes(bytes(range(256)) * 1000)
+    return site
+
+
+def test_stream_archive_contains_every_file(site):
+    data = b"".join(stream_archive(site, chunk_size=1024))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == [
+            "drafts/draft.html",
+            "image.bin",
+            "index.html",
+        ]
+        assert archive.read("image.bin") == (site / "image.bin").read_bytes()
+        assert archive.read("drafts/draft.html") == b"<p>Draft</p>"
+
+
+def test_stream_archive_yields_chunks(site):
+    chunks = list(stream_archive(site, chunk_size=1024))
+    assert len(chunks) > 1
+    assert all(chunks)
+
+
+@pytest.mark.parametrize(
+    "level, compression", [(0, zipfile.ZIP_STORED), (9, zipfile.ZIP_DEFLATED)]
+)
+def test_stream_archive_compression_level(site, level, compression):
+    data = b"".join(stream_archive(site, compresslevel=level))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.getinfo("index.html")
+        assert info.compress_type == compression
+        assert archive.read("index.html") == (site / "index.html").read_bytes()
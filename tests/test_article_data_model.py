@@ -1,3 +1,5 @@
+from app import db
+from app.helpers.search import search_articles
 from app.models import Article, ArticleData, User
 
 
@@ -162,3 +164,67 @@ def test_article_data_to_dict(session):
     assert ad_dict["value"] == "value"
     assert 1 in ad_dict["article_ids"]
     assert 2 in ad_dict["article_ids"]
+
+
+def test_article_data_is_stored_once(session):
+    user = session.get(User, 1)
+    article = Article(title="Test Article", content="Content", user=user)
+    article.data.append(ArticleData(key="tags", value="til"))
+    session.add(article)
+    session.commit()
+
+    # the same data, added to another article and twice to a third one
+    another_article = Article(title="Another Article", content="Content", user=user)
+    another_article.data.append(ArticleData(key="tags", value="til"))
+    third_article = Article(title="Third Article", content="Content", user=user)
+    third_article.data.extend(
+        [ArticleData(key="tags", value="til"), ArticleData(key="tags", value="til")]
+    )
+    session.add_all([another_article, third_article])
+    session.commit()
+
+    (article_data,) = session.scalars(db.select(ArticleData)).all()
+    assert article.data == [article_data]
+    assert another_article.data == [article_data]
+    assert third_article.data == [article_data]
+    assert len(article_data.articles) == 3
+
+
+def test_upsert_article_data(session):
+    session.add(ArticleData(key="tags", value="til"))
+    session.commit()
+
+    ids = ArticleData.upsert([("tags", "til"), ("tags", "python"), ("tags", "til")])
+    session.commit()
+
+    stored = {(datum.key, datum.value): datum.id for datum in ArticleData.query}
+    assert ids == stored
+    assert set(stored) == {("tags", "til"), ("tags", "python")}
+
+
+def test_link_article_data(session):
+    user = session.get(User, 1)
+    articles = [
+        Article(title=f"Article {i}", content="Content", user=user) for i in range(2)
+    ]
+    session.add_all(articles)
+    session.commit()
+    first, second = [article.id for article in articles]
+
+    ArticleData.link(
+        {first: [("tags", "til"), ("keywords", "pelican")], second: [("tags", "til")]}
+    )
+    # linking the same data again is a no-op
+    ArticleData.link({second: [("tags", "til")]})
+    session.commit()
+
+    session.expire_all()
+    assert ArticleData.query.count() == 2
+    assert {(d.key, d.value) for d in session.get(Article, first).data} == {
+        ("tags", "til"),
+        ("keywords", "pelican"),
+    }
+    assert [(d.key, d.value) for d in session.get(Article, second).data] == [
+        ("tags", "til")
+    ]
+    assert [r.article_id for r in search_articles(user.id, "pelican", 10)] == [first]
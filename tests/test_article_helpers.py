@@ -1,5 +1,6 @@
 import re
 import unittest
+from unittest.mock import patch
 
 from slugify import slugify
 
@@ -43,5 +44,47 @@ class SlugGenerationTests(unittest.TestCase):
         self.assertRegex(slug, rf"^{re.escape(title_slug)}-[a-f0-9]{{8}}$")
 
 
+class RenderMarkdownTests(unittest.TestCase):
+    def test_the_markdown_parser_is_created_once(self):
+        ah.render_markdown("text")
+        self.assertIs(ah._markdown(), ah._markdown())
+
+    def test_render_markdown(self):
+        self.assertEqual(ah.render_markdown("*text*"), "<p><em>text</em></p>\n")
+
+    def test_content_fingerprint_changes_with_the_content(self):
+        self.assertEqual(ah.content_fingerprint("a"), ah.content_fingerprint("a"))
+        self.assertNotEqual(ah.content_fingerprint("a"), ah.content_fingerprint("b"))
+
+
+class HighlightCodeTests(unittest.TestCase):
+    def setUp(self):
+        ah._highlighted.clear()
+
+    def test_highlight_code(self):
+        highlighted = ah.highlight_code("import random", "python")
+        self.assertIn('<span class="kn">import</span>', highlighted)
+
+    def test_highlighted_code_is_reused(self):
+        highlighted = ah.highlight_code("import random", "python")
+        with patch("app.helpers.articles.highlight") as mock_highlight:
+            self.assertEqual(ah.highlight_code("import random", "python"), highlighted)
+        mock_highlight.assert_not_called()
+
+    def test_highlighted_code_cache_is_bounded(self):
+        with patch("app.helpers.articles.HIGHLIGHT_CACHE_SIZE", 2):
+            for code in ("a = 1", "b = 2", "c = 3"):
+                ah.highlight_code(code, "python")
+        self.assertEqual(len(ah._highlighted), 2)
+
+    def test_unknown_languages_are_plain_text(self):
+        highlighted = ah.highlight_code("<b>text</b>", "no-such-language")
+        self.assertIn("&lt;b&gt;text&lt;/b&gt;", highlighted)
+
+    def test_code_blocks_in_unknown_languages(self):
+        html = ah.render_markdown("```no-such-language\ntext\n```")
+        self.assertIn("text", html)
+
+
 if __name__ == "__main__":
     unittest.main()
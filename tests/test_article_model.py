@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 
 from app.models import Article
@@ -249,5 +251,45 @@ def test_article_content_html_plugins(content, results):
     assert html == results
 
 
+def test_article_content_is_rendered_once(session):
+    article = Article(title="Title", content="- list\n- items")
+    session.add(article)
+    session.commit()
+
+    assert "<ul>" in article.rendered_html
+    with patch("app.models.render_markdown") as mock_render:
+        html = article.content_html
+
+    mock_render.assert_not_called()
+    assert html == article.rendered_html
+
+
+def test_article_content_is_rendered_again_when_it_changes(session):
+    article = Article(title="Title", content="- list\n- items")
+    session.add(article)
+    session.commit()
+    fingerprint = article.rendered_fingerprint
+
+    article.content = "1. list\n2. items"
+    session.commit()
+
+    assert article.rendered_fingerprint != fingerprint
+    assert "<ol>" in article.rendered_html
+    assert article.content_html == article.rendered_html
+
+
+def test_article_content_is_rendered_again_when_the_renderer_changes(session):
+    article = Article(title="Title", content="- list\n- items")
+    session.add(article)
+    session.commit()
+
+    with patch("app.helpers.articles.RENDERER_VERSION", "new"):
+        with patch("app.models.render_markdown", return_value="new") as mock_render:
+            html = article.content_html
+
+    mock_render.assert_called_once_with(article.content)
+    assert html == "new"
+
+
 if __name__ == "__main__":
     pytest.main(["-s", __file__])
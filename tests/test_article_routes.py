@@ -1,8 +1,13 @@
-from flask import url_for
+import html
+import re
+from unittest.mock import patch
 
-from app import models
+from flask import stream_template, url_for
+
+from app import db, models
 from app.helpers import users as uh
 from app.jinja.filters import datetime_format
+from tests.helpers import QueryCounter
 
 
 def test_attempt_to_get_all_articles_while_not_authenticated(client):
@@ -47,6 +52,37 @@ def test_get_single_article_while_authenticated(auth, client, session):
     assert article.content in response.text
 
 
+def test_article_pages_are_streamed(app, article, auth, client):
+    auth.login()
+
+    with patch(
+        "app.helpers.templates.stream_template", wraps=stream_template
+    ) as mock_stream:
+        response = client.get(url_for("articles.article", slug=article.slug))
+        assert article.title in response.text
+        assert response.text.rstrip().endswith("</html>")
+
+        response = client.get(url_for("articles.articles"))
+        assert article.title in response.text
+
+    assert mock_stream.call_count == 2
+
+
+def test_streaming_can_be_switched_off(app, article, auth, client):
+    app.config["STREAMED_ENDPOINTS"] = {"articles.articles"}
+    auth.login()
+
+    with patch(
+        "app.helpers.templates.stream_template", wraps=stream_template
+    ) as mock_stream:
+        response = client.get(url_for("articles.article", slug=article.slug))
+        assert article.title in response.text
+        mock_stream.assert_not_called()
+
+        client.get(url_for("articles.articles"))
+        mock_stream.assert_called_once()
+
+
 def test_get_single_article_while_not_authenticated(client, session):
     title = "Test Article Title"
     content = "Test article content"
@@ -225,6 +261,43 @@ def test_deleting_article_that_does_not_belong_to_the_user(auth, client, session
     assert old_article_count == len(models.Article.query.all())
 
 
+def _add_articles_with_keywords(session, user, num_articles):
+    for i in range(num_articles):
+        article = models.Article(title=f"Keyworded {i}", content="Content", user=user)
+        article.data = [
+            models.ArticleData(key="keyword", value=f"first{i}"),
+            models.ArticleData(key="keyword", value=f"second{i}"),
+            models.ArticleData(key="tags", value=f"tag{i}"),
+        ]
+        session.add(article)
+    session.commit()
+
+
+def test_articles_list_shows_the_keywords(auth, client, session, user):
+    _add_articles_with_keywords(session, user, 2)
+    auth.login()
+
+    response = client.get(url_for("articles.articles"))
+
+    assert "Keywords: first0, second0" in response.text
+    assert "Keywords: first1, second1" in response.text
+    assert "tag0" not in response.text
+
+
+def test_articles_list_loads_the_keywords_in_one_query(auth, client, session, user):
+    auth.login()
+    _add_articles_with_keywords(session, user, 1)
+    with QueryCounter(db.engine) as one_article:
+        client.get(url_for("articles.articles")).text
+
+    _add_articles_with_keywords(session, user, 5)
+    with QueryCounter(db.engine) as six_articles:
+        response = client.get(url_for("articles.articles"))
+        assert "Keywords: first4, second4" in response.text
+
+    assert six_articles.count == one_article.count
+
+
 def test_pagination_no_articles(auth, client):
     # Test that no pagination is shown when there are no articles
     auth.login()
@@ -312,6 +385,14 @@ def test_pagination_more_than_articles_per_page(app, auth, client, session):
     assert "Next" in response.text
 
 
+def _pager_link(response, label):
+    match = re.search(
+        rf'href="([^"#]+)">\s*(?:<span aria-hidden="true">&larr;</span> )?{label}',
+        response.text,
+    )
+    return html.unescape(match.group(1)) if match else None
+
+
 def test_pagination_pagination_links(app, auth, client, session):
     # Set up the Config object with the desired ARTICLES_PER_PAGE value
     app.config["ARTICLES_PER_PAGE"] = 10
@@ -331,22 +412,39 @@ def test_pagination_pagination_links(app, auth, client, session):
     response = client.get(url_for("articles.articles"))
     assert "Article 0" in response.text
     assert "Article 9" in response.text
+    assert "50 articles" in response.text
+    assert _pager_link(response, "Previous") is None
 
-    response = client.get(url_for("articles.articles", page=2))
+    response = client.get(_pager_link(response, "Next"))
     assert "Article 10" in response.text
     assert "Article 14" in response.text
+    assert not re.search(r"Article 9\s*</a>", response.text)
 
-    response = client.get(url_for("articles.articles", page=1))
+    response = client.get(_pager_link(response, "Previous"))
     assert "Article 0" in response.text
     assert "Article 9" in response.text
-
-    response = client.get(url_for("articles.articles", page=3))
     assert "Article 10" not in response.text
-    assert "Article 14" not in response.text
+    assert _pager_link(response, "Previous") is None
 
-    response = client.get(url_for("articles.articles", page=4))
-    assert "Article 10" not in response.text
-    assert "Article 14" not in response.text
+    for _ in range(4):
+        response = client.get(_pager_link(response, "Next"))
+    assert "Article 40" in response.text
+    assert "Article 49" in response.text
+    assert _pager_link(response, "Next") is None
+
+    response = client.get(_pager_link(response, "Previous"))
+    assert "Article 30" in response.text
+    assert "Article 39" in response.text
+    assert "Article 40" not in response.text
+
+
+def test_pagination_with_an_invalid_cursor(auth, article, client):
+    auth.login()
+
+    response = client.get(url_for("articles.articles", after="not-a-cursor"))
+
+    assert response.status_code == 200
+    assert article.title in response.text
 
 
 def test_cant_view_another_users_article(article, auth, client, session):
@@ -389,3 +487,31 @@ if __name__ == "__main__":
     import pytest
 
     pytest.main(["-s", __file__])
+
+
+def test_search_articles(auth, client, session, user):
+    article = models.Article(title="Pelican", content="About <b>pelican</b>", user=user)
+    session.add(article)
+    session.commit()
+
+    auth.login()
+    response = client.get(url_for("articles.search", q="pelican"))
+
+    assert response.status_code == 200
+    assert article.slug in response.text
+    assert "About &lt;b&gt;<mark>pelican</mark>&lt;/b&gt;" in response.text
+
+
+def test_search_articles_without_results(auth, article, client):
+    auth.login()
+    response = client.get(url_for("articles.search", q="pelican"))
+
+    assert response.status_code == 200
+    assert "No articles match" in response.text
+
+
+def test_search_box_on_the_articles_page(auth, client):
+    auth.login()
+    response = client.get(url_for("articles.articles"))
+
+    assert 'name="q"' in response.text
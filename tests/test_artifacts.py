@@ -0,0 +1,74 @@
+import os
+
+from app.main.artifacts import SITE_DIR, ArtifactCache
+
+
+def _make_site(path, size):
+    path.mkdir(parents=True)
+    (path / "index.html").write_bytes(b"x" * size)
+    return path
+
+
+def test_put_and_get(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts")
+    site = _make_site(tmp_path / "output", 10)
+
+    cached = cache.put("key", site)
+
+    assert cached == tmp_path / "artifacts" / "key" / SITE_DIR
+    assert (cached / "index.html").read_bytes() == b"x" * 10
+    assert not site.exists()
+    assert cache.get("key") == cached
+    assert cache.artifacts()[0][0] == "key"
+    assert cache.artifacts()[0][2] == 10
+
+
+def test_get_missing_key(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts")
+
+    assert cache.get("missing") is None
+    assert cache.artifacts() == []
+
+
+def test_put_existing_key_keeps_the_cached_site(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts")
+    cached = cache.put("key", _make_site(tmp_path / "first", 10))
+
+    assert cache.put("key", _make_site(tmp_path / "second", 20)) == cached
+    assert (cached / "index.html").read_bytes() == b"x" * 10
+    assert not (tmp_path / "second").exists()
+    assert [key for key, *_ in cache.artifacts()] == ["key"]
+
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts", quota=25)
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, _make_site(tmp_path / key, 10))
+        # make the order of use unambiguous
+        os.utime(tmp_path / "artifacts" / key / "size", (i, i))
+    cache.get("a")
+
+    cache.put("c", _make_site(tmp_path / "c", 10))
+
+    assert sorted(key for key, *_ in cache.artifacts()) == ["a", "c"]
+    assert cache.get("b") is None
+
+
+def test_the_newest_artifact_is_kept_even_over_quota(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts", quota=5)
+
+    cached = cache.put("key", _make_site(tmp_path / "output", 10))
+
+    assert cached.exists()
+
+
+def test_key_of_and_remove(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts")
+    cached = cache.put("key", _make_site(tmp_path / "output", 10))
+
+    assert cache.key_of(cached) == "key"
+    assert cache.key_of(tmp_path / "output") is None
+
+    cache.remove("key")
+
+    assert cache.get("key") is None
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.main import batches, jobs
+
+
+def _make_user(session, username, num_articles=1):
+    user = models.User(username=username, email=f"{username}@example.com")
+    user.articles = [
+        models.Article(title=f"{username} {i}", content="Content")
+        for i in range(num_articles)
+    ]
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_enqueue_batch_queues_users_with_articles(session):
+    writers = [_make_user(session, f"writer{i}") for i in range(3)]
+    _make_user(session, "reader", num_articles=0)
+
+    assert batches.enqueue_batch("batch") == 3
+
+    jobs = models.CompileJob.query.filter_by(batch="batch").all()
+    assert sorted(job.user_id for job in jobs) == sorted(user.id for user in writers)
+    assert all(job.status == models.CompileJob.QUEUED for job in jobs)
+    assert all(job.created_at is not None for job in jobs)
+
+
+def test_enqueue_batch_resumes_a_batch(session):
+    users = [_make_user(session, f"writer{i}") for i in range(4)]
+    batches.enqueue_batch("batch")
+    jobs = {job.user_id: job for job in models.CompileJob.query.all()}
+    jobs[users[0].id].succeed("site")
+    jobs[users[1].id].fail("Pelican broke")
+    jobs[users[2].id].status = models.CompileJob.RUNNING
+    session.commit()
+    new_user = _make_user(session, "newcomer")
+
+    # the running job (left by a crash) and the new user are queued
+    assert batches.enqueue_batch("batch") == 2
+    assert jobs[users[2].id].status == models.CompileJob.QUEUED
+    assert jobs[users[1].id].status == models.CompileJob.FAILED
+    assert models.CompileJob.query.filter_by(user_id=new_user.id).count() == 1
+
+    assert batches.enqueue_batch("batch", retry_failed=True) == 1
+    assert jobs[users[1].id].status == models.CompileJob.QUEUED
+    assert jobs[users[1].id].error is None
+    assert models.CompileJob.query.count() == 5
+
+
+def test_summarize_batch(session):
+    users = [_make_user(session, f"writer{i}") for i in range(3)]
+    batches.enqueue_batch("batch")
+    jobs = {job.user_id: job for job in models.CompileJob.query.all()}
+    start = datetime(2023, 1, 1)
+    for job in jobs.values():
+        job.started_at = start
+    jobs[users[0].id].succeed("site")
+    jobs[users[1].id].fail("Pelican broke")
+    jobs[users[0].id].finished_at = start + timedelta(seconds=2)
+    jobs[users[1].id].finished_at = start + timedelta(seconds=4)
+    session.commit()
+
+    summary = batches.summarize_batch("batch")
+
+    assert (summary.queued, summary.succeeded, summary.failed) == (1, 1, 1)
+    assert summary.total == 3
+    assert summary.failures == [("writer1", "Pelican broke")]
+    assert summary.seconds == 4
+    assert summary.throughput == 0.5
+
+
+def test_new_batch_ids_are_unique():
+    assert batches.new_batch() != batches.new_batch()
+
+
+def test_enqueue_batch_attaches_jobs_in_flight_from_another_batch(session):
+    users = [_make_user(session, f"writer{i}") for i in range(2)]
+    batches.enqueue_batch("first")
+    running_id = models.CompileJob.claim_next()
+
+    assert batches.enqueue_batch("second") == 2
+
+    jobs = models.CompileJob.query.order_by(models.CompileJob.id).all()
+    assert len(jobs) == 2
+    assert all(job.batch == "second" for job in jobs)
+    assert jobs[0].id == running_id
+    assert {job.user_id for job in jobs} == {user.id for user in users}
+
+
+def test_retrying_failed_jobs_keeps_one_job_in_flight(session):
+    user = _make_user(session, "writer")
+    batches.enqueue_batch("batch")
+    job = models.CompileJob.query.one()
+    job.fail("Pelican broke")
+    session.commit()
+
+    assert batches.enqueue_batch("batch", retry_failed=True) == 1
+
+    assert job.status == models.CompileJob.QUEUED
+    assert job.lease == models.CompileJob.lease_for(user.id)
+    assert jobs.enqueue_compile(user) == job
+    assert models.CompileJob.query.count() == 1
+
+
+def test_retrying_failed_jobs_skips_users_with_a_job_in_flight(session):
+    user = _make_user(session, "writer")
+    batches.enqueue_batch("batch")
+    failed = models.CompileJob.query.one()
+    failed.fail("Pelican broke")
+    session.commit()
+    in_flight = jobs.enqueue_compile(user)
+
+    assert batches.enqueue_batch("batch", retry_failed=True) == 1
+
+    assert failed.status == models.CompileJob.FAILED
+    assert in_flight.batch == "batch"
@@ -0,0 +1,320 @@
+import multiprocessing
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import ANY, patch
+
+import pytest
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db, models
+from app.main import jobs
+from app.main.artifacts import ARTIFACTS_DIR
+from app.main.snapshot import ArticleSnapshot
+
+
+def _make_users(session, num_users):
+    users = [
+        models.User(username=f"user{i}", email=f"user{i}@example.com")
+        for i in range(num_users)
+    ]
+    session.add_all(users)
+    session.commit()
+    return users
+
+
+def test_enqueue_compile(session, user):
+    job = jobs.enqueue_compile(user)
+
+    assert job.id is not None
+    assert job.status == models.CompileJob.QUEUED
+    assert job.user == user
+
+
+def test_claiming_jobs_in_order(session, user):
+    first_user, second_user = _make_users(session, 2)
+    first = jobs.enqueue_compile(first_user)
+    second = jobs.enqueue_compile(second_user)
+
+    assert models.CompileJob.claim_next() == first.id
+    assert models.CompileJob.claim_next() == second.id
+    assert models.CompileJob.claim_next() is None
+
+    session.refresh(first)
+    assert first.status == models.CompileJob.RUNNING
+    assert first.started_at is not None
+
+
+def test_running_a_compile_job(article, session, tmp_path, user):
+    job = jobs.enqueue_compile(user)
+    archive = tmp_path / "test-output.zip"
+    snapshot = ArticleSnapshot.from_article(article)
+
+    with patch("app.main.jobs.compile_posts") as mock_compile_posts:
+        mock_compile_posts.return_value = archive
+        job = jobs.run_compile_job(job.id, directory=tmp_path)
+
+    mock_compile_posts.assert_called_once_with(
+        articles=[snapshot],
+        directory=tmp_path,
+        in_memory=True,
+        artifacts=ANY,
+        report=ANY,
+        prerendered=False,
+    )
+    artifacts = mock_compile_posts.call_args.kwargs["artifacts"]
+    assert artifacts.root == tmp_path / ARTIFACTS_DIR
+    assert job.status == models.CompileJob.SUCCEEDED
+    assert job.artifact_path == str(archive)
+    assert job.finished_at is not None
+
+
+def test_failed_compile_job_records_the_error(article, session, tmp_path, user):
+    job = jobs.enqueue_compile(user)
+
+    with patch("app.main.jobs.compile_posts") as mock_compile_posts:
+        mock_compile_posts.side_effect = RuntimeError("Pelican broke")
+        job = jobs.run_compile_job(job.id, directory=tmp_path)
+
+    assert job.status == models.CompileJob.FAILED
+    assert job.error == "Pelican broke"
+    assert [stage["name"] for stage in job.report["stages"]] == ["query"]
+
+
+def test_compile_job_records_a_report(article, session, tmp_path, user):
+    job = jobs.enqueue_compile(user)
+
+    job = jobs.run_compile_job(job.id, directory=tmp_path)
+
+    assert job.status == models.CompileJob.SUCCEEDED
+    assert [stage["name"] for stage in job.report["stages"]] == [
+        "query",
+        "metadata",
+        "posts",
+        "pelican",
+        "artifact",
+    ]
+    assert job.report["counts"]["articles"] == 1
+    assert job.report["counts"]["cached"] is False
+
+    user = session.get(models.User, job.user_id)
+    job = jobs.run_compile_job(jobs.enqueue_compile(user).id, directory=tmp_path)
+
+    assert job.report["counts"]["cached"] is True
+    assert [stage["name"] for stage in job.report["stages"]] == ["query", "metadata"]
+
+
+def test_compile_job_with_prerendered_html(app, article, session, tmp_path, user):
+    app.config["COMPILE_PRERENDERED"] = True
+
+    job = jobs.run_compile_job(jobs.enqueue_compile(user).id, directory=tmp_path)
+
+    assert job.status == models.CompileJob.SUCCEEDED
+    assert job.report["counts"]["prerendered"] == 1
+
+
+def test_compile_job_without_articles_fails(session, tmp_path, user):
+    job = jobs.enqueue_compile(user)
+    job = jobs.run_compile_job(job.id, directory=tmp_path)
+
+    assert job.status == models.CompileJob.FAILED
+
+
+def test_enqueue_compile_attaches_to_the_job_in_flight(session, user):
+    job = jobs.enqueue_compile(user)
+
+    assert jobs.enqueue_compile(user) == job
+    assert models.CompileJob.claim_next() == job.id
+    assert jobs.enqueue_compile(user) == job
+
+    job.succeed("site")
+    session.commit()
+    new_job = jobs.enqueue_compile(user)
+
+    assert new_job != job
+    assert new_job.status == models.CompileJob.QUEUED
+
+
+def test_enqueue_compile_replaces_a_stale_job(app, session, user):
+    job = jobs.enqueue_compile(user)
+    models.CompileJob.claim_next()
+    job.started_at = datetime.utcnow() - timedelta(
+        seconds=app.config["COMPILE_LEASE_TIMEOUT"] + 1
+    )
+    session.commit()
+
+    new_job = jobs.enqueue_compile(user)
+
+    assert new_job != job
+    assert job.status == models.CompileJob.FAILED
+    assert job.lease is None
+
+
+def test_enqueue_compile_uses_the_job_queued_by_a_concurrent_request(session, user):
+    job = jobs.enqueue_compile(user)
+    select = db.select
+    lookups = []
+
+    def miss_the_first_lookup(*args, **kwargs):
+        # the job isn't found the first time, as if it was queued by another
+        # request between the lookup and the insert
+        lookups.append(args)
+        if len(lookups) == 1:
+            return select(models.CompileJob).filter_by(id=-1)
+        return select(*args, **kwargs)
+
+    with patch("app.main.jobs.db.select", side_effect=miss_the_first_lookup):
+        assert jobs.enqueue_compile(user) == job
+    assert len(lookups) == 2
+    assert models.CompileJob.query.count() == 1
+
+
+def test_enqueue_compile_gives_up_when_the_lookup_keeps_missing(session, user):
+    jobs.enqueue_compile(user)
+    select = db.select
+    missing = select(models.CompileJob).filter_by(id=-1)
+
+    with patch("app.main.jobs.db.select", return_value=missing) as mock_select:
+        with pytest.raises(IntegrityError):
+            jobs.enqueue_compile(user)
+    assert mock_select.call_count == jobs.ENQUEUE_ATTEMPTS
+
+
+def test_result_of_a_replaced_job_is_dropped(app, article, session, tmp_path, user):
+    job = jobs.enqueue_compile(user)
+    models.CompileJob.claim_next()
+    job.fail("The compile timed out.")
+    session.commit()
+
+    with patch("app.main.jobs.compile_posts", return_value=tmp_path):
+        job = jobs.run_compile_job(job.id, directory=tmp_path)
+
+    assert job.status == models.CompileJob.FAILED
+    assert job.artifact_path is None
+
+
+def test_small_sites_are_built_in_the_scratch_folder(
+    app, article, session, tmp_path, user
+):
+    scratch = tmp_path / "scratch"
+    app.config["COMPILE_SCRATCH_FOLDER"] = str(scratch)
+    build_path = tmp_path / "builds"
+
+    job = jobs.run_compile_job(jobs.enqueue_compile(user).id, directory=build_path)
+
+    assert job.status == models.CompileJob.SUCCEEDED
+    assert job.report["counts"]["scratch"] is True
+    assert (scratch / job.user.username_lower).is_dir()
+    assert not (build_path / job.user.username_lower).exists()
+    assert Path(job.artifact_path).is_relative_to(build_path / ARTIFACTS_DIR)
+
+
+def test_large_sites_are_built_in_the_build_folder(
+    app, article, session, tmp_path, user
+):
+    scratch = tmp_path / "scratch"
+    app.config["COMPILE_SCRATCH_FOLDER"] = str(scratch)
+    build_path = tmp_path / "builds"
+    user_id, article_id = user.id, article.id
+    jobs.run_compile_job(jobs.enqueue_compile(user).id, directory=build_path)
+    app.config["COMPILE_SCRATCH_MAX_BYTES"] = 0
+    # a changed site, so it isn't taken from the artifact cache
+    session.get(models.Article, article_id).content = "New content"
+    session.commit()
+
+    user = session.get(models.User, user_id)
+    job = jobs.run_compile_job(jobs.enqueue_compile(user).id, directory=build_path)
+
+    assert job.report["counts"]["scratch"] is False
+    assert (build_path / job.user.username_lower).is_dir()
+    assert not (scratch / job.user.username_lower).exists()
+
+
+def test_builds_of_evicted_sites_are_expired(app, session, tmp_path):
+    app.config["ARTIFACT_CACHE_QUOTA"] = 1
+    users = _make_users(session, 2)
+    session.add_all(
+        models.Article(title="Title", content="Content", user=user) for user in users
+    )
+    session.commit()
+    user_ids = [user.id for user in users]
+
+    first = jobs.run_compile_job(
+        jobs.enqueue_compile(session.get(models.User, user_ids[0])).id,
+        directory=tmp_path,
+    )
+    first_id = first.id
+    assert not first.is_expired
+    second = jobs.run_compile_job(
+        jobs.enqueue_compile(session.get(models.User, user_ids[1])).id,
+        directory=tmp_path,
+    )
+
+    assert not second.is_expired
+    assert session.get(models.CompileJob, first_id).is_expired
+
+
+def test_work_runs_queued_jobs_until_idle(session, tmp_path, user):
+    queued = [jobs.enqueue_compile(user).id for user in _make_users(session, 2)]
+
+    with patch("app.main.jobs.run_compile_job") as mock_run_compile_job:
+        code = jobs.work(burst=True)
+
+    assert code == jobs.IDLE
+    assert [c.args[0] for c in mock_run_compile_job.call_args_list] == queued
+
+
+def test_work_stops_after_max_builds(session, user):
+    queued = [jobs.enqueue_compile(user).id for user in _make_users(session, 3)]
+    num_jobs = multiprocessing.Value("i", 0)
+    current_job = multiprocessing.Value("i", 0)
+
+    with patch("app.main.jobs.run_compile_job") as mock_run_compile_job:
+        code = jobs.work(
+            current_job=current_job, num_jobs=num_jobs, burst=True, max_builds=2
+        )
+
+    assert code == jobs.RECYCLE
+    assert mock_run_compile_job.call_count == 2
+    assert num_jobs.value == 2
+    assert current_job.value == 0
+    assert models.CompileJob.claim_next() == queued[2]
+
+
+def test_work_stops_once_memory_is_exceeded(session, user):
+    for user in _make_users(session, 2):
+        jobs.enqueue_compile(user)
+
+    with patch("app.main.jobs.run_compile_job") as mock_run_compile_job:
+        code = jobs.work(burst=True, max_memory=1)
+
+    assert code == jobs.RECYCLE
+    assert mock_run_compile_job.call_count == 1
+
+
+def test_prewarm_compiles_a_site(app):
+    with patch("app.main.jobs.compile_posts") as mock_compile_posts:
+        jobs.prewarm()
+
+    articles = mock_compile_posts.call_args.kwargs["articles"]
+    assert len(articles) == 1
+    assert articles[0].content
+
+
+def test_workers_use_the_config_of_the_app(app, tmp_path):
+    app.config["BUILD_FOLDER"] = str(tmp_path)
+    worker_configs = []
+
+    def work(**kwargs):
+        worker_configs.append(dict(current_app.config))
+        return jobs.IDLE
+
+    with patch("app.main.jobs.prewarm"), patch("app.main.jobs.work", work):
+        with pytest.raises(SystemExit):
+            jobs._worker_main(jobs._worker_config(), None, None, 0, True, None, None)
+
+    assert worker_configs[0]["BUILD_FOLDER"] == str(tmp_path)
+    assert (
+        worker_configs[0]["SQLALCHEMY_DATABASE_URI"]
+        == app.config["SQLALCHEMY_DATABASE_URI"]
+    )
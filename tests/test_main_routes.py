@@ -1,3 +1,5 @@
+import io
+import zipfile
 from pathlib import Path
 from unittest.mock import patch
 
@@ -283,12 +285,150 @@ def test_attempting_to_compile_for_different_user(auth, client, session, user):
 def test_attempting_to_compile_for_owning_user(article, auth, client, user):
     auth.login()
 
-    with patch("app.main.albatross.compile_posts") as mock_compile_posts:
+    with patch("app.main.jobs.compile_posts") as mock_compile_posts:
         response = client.post(
             url_for("main.compile_site", username=user.username), follow_redirects=False
         )
 
+    assert response.status_code == 202
+    assert not mock_compile_posts.called
+    job = models.CompileJob.query.get(response.json["id"])
+    assert job.status == models.CompileJob.QUEUED
+    assert job.user == user
+    status_url = url_for(
+        "main.compile_status",
+        username=user.username_lower,
+        job_id=job.id,
+        _external=False,
+    )
+    assert response.headers["Location"] == status_url
+
+
+def test_compiling_from_a_browser_shows_the_job(article, auth, client, user):
+    auth.login()
+    browser = {"Accept": "text/html,application/xhtml+xml,*/*;q=0.8"}
+
+    response = client.post(
+        url_for("main.compile_site", username=user.username), headers=browser
+    )
+
+    assert response.status_code == 303
+    job = models.CompileJob.query.one()
+    status_url = url_for(
+        "main.compile_status",
+        username=user.username_lower,
+        job_id=job.id,
+        _external=False,
+    )
+    assert response.headers["Location"] == status_url
+
+    response = client.get(status_url, headers=browser)
+
+    assert response.status_code == 200
+    assert b'http-equiv="refresh"' in response.data
+    assert b"queued" in response.data
+
+
+def test_compile_status_page_links_to_the_download(
+    auth, client, session, tmp_path, user
+):
+    auth.login()
+    job = models.CompileJob(user=user).succeed(tmp_path)
+    session.add(job)
+    session.commit()
+
+    response = client.get(
+        url_for("main.compile_status", username=user.username, job_id=job.id),
+        headers={"Accept": "text/html"},
+    )
+
+    download_url = url_for(
+        "main.download_site",
+        username=user.username_lower,
+        job_id=job.id,
+        _external=False,
+    )
+    assert download_url.encode() in response.data
+    assert b'http-equiv="refresh"' not in response.data
+
+
+def test_getting_compile_job_status(auth, client, session, user):
+    auth.login()
+    job = models.CompileJob(user=user)
+    session.add(job)
+    session.commit()
+
+    response = client.get(
+        url_for("main.compile_status", username=user.username, job_id=job.id)
+    )
+
+    assert response.status_code == 200
+    assert response.json["status"] == models.CompileJob.QUEUED
+    assert "download_url" not in response.json
+
+
+def test_getting_another_users_compile_job_status(auth, client, session, user):
+    new_user = models.User(username="new_user", email="new_user@example.com")
+    job = models.CompileJob(user=new_user)
+    session.add_all([new_user, job])
+    session.commit()
+
+    auth.login()
+    response = client.get(
+        url_for("main.compile_status", username=user.username, job_id=job.id)
+    )
+
+    assert response.status_code == 404
+
+
+def test_getting_compile_report(auth, client, session, user):
+    auth.login()
+    job = models.CompileJob(user=user)
+    session.add(job)
+    session.commit()
+    report_url = url_for("main.compile_report", username=user.username, job_id=job.id)
+
+    assert client.get(report_url).status_code == 409
+
+    job.fail("Pelican broke")
+    job.report = {"stages": [{"name": "query", "seconds": 0.1}], "counts": {}}
+    session.commit()
+    status = client.get(
+        url_for("main.compile_status", username=user.username, job_id=job.id)
+    ).json
+    response = client.get(report_url)
+
+    assert status["report_url"] == url_for(
+        "main.compile_report",
+        username=user.username_lower,
+        job_id=job.id,
+        _external=False,
+    )
     assert response.status_code == 200
+    assert response.json == job.report
+
+
+def test_downloading_compiled_site(auth, client, session, tmp_path, user):
+    auth.login()
+    output_dir = tmp_path / "test-output"
+    output_dir.mkdir()
+    (output_dir / "index.html").write_text("<h1>Index</h1>")
+    job = models.CompileJob(user=user)
+    session.add(job)
+    session.commit()
+
+    download_url = url_for("main.download_site", username=user.username, job_id=job.id)
+    response = client.get(download_url)
+    assert response.status_code == 409
+
+    job.succeed(output_dir)
+    session.commit()
+    response = client.get(download_url)
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert "test-output.zip" in response.headers["Content-Disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.read("index.html") == b"<h1>Index</h1>"
 
 
 def test_cant_access_another_users_profile(auth, client, session):
@@ -322,3 +462,35 @@ def test_cant_change_another_users_profile(auth, client, session):
     assert response.status_code == 302
     main_page_url = url_for("main.index", _external=False)
     assert response.headers.get("Location")[: len(main_page_url)] == main_page_url
+
+
+def test_listing_builds(auth, client, session, tmp_path, user):
+    auth.login()
+    other_user = models.User(username="new_user", email="new_user@example.com")
+    expired_job = models.CompileJob(user=user).succeed(tmp_path).expire()
+    job = models.CompileJob(user=user).succeed(tmp_path)
+    session.add_all([expired_job, job, models.CompileJob(user=other_user)])
+    session.commit()
+
+    response = client.get(url_for("main.list_builds", username=user.username))
+
+    assert response.status_code == 200
+    assert response.json["total"] == 2
+    builds = response.json["builds"]
+    assert [build["id"] for build in builds] == [job.id, expired_job.id]
+    assert "download_url" in builds[0]
+    assert builds[1]["expired"]
+    assert "download_url" not in builds[1]
+
+
+def test_downloading_expired_build(auth, client, session, tmp_path, user):
+    auth.login()
+    job = models.CompileJob(user=user).succeed(tmp_path).expire()
+    session.add(job)
+    session.commit()
+
+    response = client.get(
+        url_for("main.download_site", username=user.username, job_id=job.id)
+    )
+
+    assert response.status_code == 410
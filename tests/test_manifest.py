@@ -0,0 +1,37 @@
+from app.main.manifest import MANIFEST_NAME, BuildManifest, hash_settings
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = BuildManifest(tmp_path / MANIFEST_NAME, settings_hash="settings")
+    manifest.record("1", "article-1.md", "digest")
+    manifest.save()
+
+    loaded = BuildManifest.load(tmp_path / MANIFEST_NAME)
+    assert loaded.settings_hash == "settings"
+    assert loaded.is_current("1", "article-1.md", "digest")
+    assert not loaded.is_current("1", "article-1.md", "other-digest")
+    assert not loaded.is_current("2", "article-2.md", "digest")
+
+
+def test_loading_missing_or_corrupt_manifest_gives_empty_manifest(tmp_path):
+    manifest = BuildManifest.load(tmp_path / MANIFEST_NAME)
+    assert manifest.settings_hash is None
+    assert manifest.articles == {}
+
+    (tmp_path / MANIFEST_NAME).write_text("not json")
+    manifest = BuildManifest.load(tmp_path / MANIFEST_NAME)
+    assert manifest.articles == {}
+
+
+def test_manifest_forget_returns_file_names(tmp_path):
+    manifest = BuildManifest(tmp_path / MANIFEST_NAME)
+    manifest.record("1", "article-1.md", "a")
+    manifest.record("2", "article-2.md", "b")
+
+    assert manifest.forget({"2", "3"}) == ["article-2.md"]
+    assert list(manifest.articles) == ["1"]
+
+
+def test_hash_settings_is_order_independent():
+    assert hash_settings({"a": 1, "b": [1, 2]}) == hash_settings({"b": [1, 2], "a": 1})
+    assert hash_settings({"a": 1}) != hash_settings({"a": 2})
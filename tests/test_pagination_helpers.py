@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from app import db, models
+from app.helpers.pagination import keyset_paginate
+
+
+KEYS = (models.Article.created_at, models.Article.id)
+
+
+def _make_articles(session, user, num_articles, created_at=None):
+    articles = [
+        models.Article(
+            title=f"Article {i}",
+            content="Content",
+            user=user,
+            created_at=created_at or datetime(2023, 1, 1) + timedelta(days=i),
+        )
+        for i in range(num_articles)
+    ]
+    session.add_all(articles)
+    session.commit()
+    return [article.id for article in articles]
+
+
+def _page(**kwargs):
+    return keyset_paginate(db.select(models.Article), keys=KEYS, per_page=2, **kwargs)
+
+
+def _ids(page):
+    return [article.id for article in page.items]
+
+
+def test_keyset_paginate_forwards_and_backwards(session, user):
+    ids = _make_articles(session, user, 5)
+
+    first = _page()
+    assert _ids(first) == ids[:2]
+    assert not first.has_prev and first.has_next
+
+    second = _page(after=first.next_cursor)
+    assert _ids(second) == ids[2:4]
+    assert second.has_prev and second.has_next
+
+    last = _page(after=second.next_cursor)
+    assert _ids(last) == ids[4:]
+    assert last.has_prev and not last.has_next
+
+    assert _ids(_page(before=last.prev_cursor)) == ids[2:4]
+    back_to_first = _page(before=second.prev_cursor)
+    assert _ids(back_to_first) == ids[:2]
+    assert not back_to_first.has_prev and back_to_first.has_next
+
+
+def test_keyset_paginate_breaks_ties_with_the_last_key(session, user):
+    ids = _make_articles(session, user, 5, created_at=datetime(2023, 1, 1))
+
+    seen = []
+    page = _page()
+    while True:
+        seen.extend(_ids(page))
+        if not page.has_next:
+            break
+        page = _page(after=page.next_cursor)
+
+    assert seen == ids
+
+
+def test_keyset_paginate_ignores_invalid_cursors(session, user):
+    ids = _make_articles(session, user, 3)
+
+    for cursor in ("not-a-cursor", "WzFd", ""):
+        assert _ids(_page(after=cursor)) == ids[:2]
+        assert _ids(_page(before=cursor)) == ids[:2]
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from app import db, models
+from app.main.prerender import prerender_articles
+
+
+def _make_cold_articles(session, user, num_articles):
+    articles = [
+        models.Article(title=f"Article {i}", content=f"*Content {i}*", user=user)
+        for i in range(num_articles)
+    ]
+    session.add_all(articles)
+    session.commit()
+    ids = [article.id for article in articles]
+    _forget_html(session, ids)
+    return ids
+
+
+def _forget_html(session, ids, **values):
+    # as if the articles were written before their HTML was cached
+    session.execute(
+        db.update(models.Article)
+        .where(models.Article.id.in_(ids))
+        .values(
+            rendered_html=None, rendered_fingerprint=None, updated_at=None, **values
+        )
+    )
+    session.commit()
+
+
+def test_prerender_articles(session, user):
+    ids = _make_cold_articles(session, user, 3)
+
+    summary = prerender_articles(processes=1, batch_size=2)
+
+    assert summary.rendered == 3
+    assert summary.skipped == 0
+    for i, article_id in enumerate(ids):
+        article = session.get(models.Article, article_id)
+        assert article.rendered_html == f"<p><em>Content {i}</em></p>\n"
+        assert article.updated_at is None
+
+
+def test_prerender_articles_skips_current_articles(session, user):
+    _make_cold_articles(session, user, 2)
+    prerender_articles(processes=1)
+
+    summary = prerender_articles(processes=1)
+
+    assert summary.rendered == 0
+    assert summary.skipped == 2
+
+
+def test_prerender_articles_in_processes(session, user):
+    ids = _make_cold_articles(session, user, 4)
+
+    summary = prerender_articles(processes=2)
+
+    assert summary.rendered == 4
+    assert all(session.get(models.Article, id).rendered_html for id in ids)
+
+
+def test_prerender_articles_of_a_user(session, user):
+    other_user = models.User(username="other", email="other@example.com")
+    session.add(other_user)
+    session.commit()
+    _make_cold_articles(session, user, 2)
+    other_ids = _make_cold_articles(session, other_user, 1)
+
+    summary = prerender_articles(username="OTHER", processes=1)
+
+    assert summary.rendered == 1
+    assert summary.skipped == 0
+    assert session.get(models.Article, other_ids[0]).rendered_html
+
+
+def test_prerender_articles_since(session, user):
+    old_id, new_id = _make_cold_articles(session, user, 2)
+    _forget_html(session, [old_id], created_at=datetime.utcnow() - timedelta(days=2))
+
+    summary = prerender_articles(
+        since=datetime.utcnow() - timedelta(days=1), processes=1
+    )
+
+    assert summary.rendered == 1
+    assert session.get(models.Article, old_id).rendered_html is None
+    assert session.get(models.Article, new_id).rendered_html
@@ -0,0 +1,60 @@
+import pytest
+
+from app.main.report import CompileReport, memory_usage
+
+
+def test_stages_are_recorded_in_order():
+    report = CompileReport()
+
+    with report.stage("query"):
+        pass
+    with report.stage("pelican"):
+        sum(range(10_000))
+
+    stages = report.to_dict()["stages"]
+    assert [stage["name"] for stage in stages] == ["query", "pelican"]
+    for stage in stages:
+        assert stage["seconds"] >= 0
+        assert stage["cpu_seconds"] >= 0
+        assert stage["rss"] > 0
+
+
+def test_failed_stage_is_recorded():
+    report = CompileReport()
+
+    with pytest.raises(RuntimeError):
+        with report.stage("pelican"):
+            raise RuntimeError("Pelican broke")
+
+    assert report.to_dict()["stages"][0]["name"] == "pelican"
+
+
+def test_report_totals_and_counts():
+    report = CompileReport()
+    with report.stage("query"):
+        pass
+    with report.stage("metadata"):
+        pass
+    report.count("articles", 3)
+
+    data = report.to_dict()
+
+    assert data["counts"] == {"articles": 3}
+    assert data["seconds"] == pytest.approx(
+        sum(stage["seconds"] for stage in data["stages"])
+    )
+    assert data["max_rss"] == max(stage["rss"] for stage in data["stages"])
+    assert "query" in report.summary()
+    assert "articles=3" in report.summary()
+
+
+def test_empty_report():
+    data = CompileReport().to_dict()
+
+    assert data["stages"] == []
+    assert data["seconds"] == 0
+    assert data["max_rss"] == 0
+
+
+def test_memory_usage():
+    assert memory_usage() > 0
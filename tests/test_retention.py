@@ -0,0 +1,107 @@
+import os
+import time
+
+from app import models
+from app.main.artifacts import ARTIFACTS_DIR, SIZE_FILE, ArtifactCache
+from app.main.retention import STALE_AFTER, collect_garbage, expire_builds
+
+
+def _long_ago():
+    then = time.time() - STALE_AFTER - 60
+    return (then, then)
+
+
+def _make_build(session, tmp_path, user, key, size=10):
+    cache = ArtifactCache(tmp_path / ARTIFACTS_DIR)
+    site = tmp_path / f"{key}-site"
+    site.mkdir()
+    (site / "index.html").write_bytes(b"x" * size)
+    job = models.CompileJob(user=user).succeed(cache.put(key, site))
+    session.add(job)
+    session.commit()
+    return job
+
+
+def test_expire_builds_keeps_the_last_builds_of_each_user(session, tmp_path, user):
+    other_user = models.User(username="other", email="other@example.com")
+    session.add(other_user)
+    jobs = [_make_build(session, tmp_path, user, f"key-{i}") for i in range(3)]
+    other_job = _make_build(session, tmp_path, other_user, "other-key")
+
+    expired = expire_builds(keep=2)
+    session.commit()
+
+    assert expired == [jobs[0].id]
+    assert jobs[0].is_expired
+    assert not jobs[1].is_expired and not jobs[2].is_expired
+    assert not other_job.is_expired
+
+
+def test_collect_garbage_removes_the_sites_of_expired_builds(session, tmp_path, user):
+    jobs = [_make_build(session, tmp_path, user, f"key-{i}") for i in range(3)]
+    cache = ArtifactCache(tmp_path / ARTIFACTS_DIR)
+    for key, *_ in cache.artifacts():
+        os.utime(cache.root / key / SIZE_FILE, _long_ago())
+
+    report = collect_garbage(tmp_path, keep=1)
+
+    assert report.expired_builds == 2
+    assert report.removed_artifacts == 2
+    assert [key for key, *_ in cache.artifacts()] == ["key-2"]
+    assert jobs[0].is_expired and jobs[1].is_expired
+    assert not jobs[2].is_expired
+
+
+def test_collect_garbage_keeps_recently_used_sites(session, tmp_path, user):
+    _make_build(session, tmp_path, user, "key-0")
+    _make_build(session, tmp_path, user, "key-1")
+
+    report = collect_garbage(tmp_path, keep=1)
+
+    assert report.expired_builds == 1
+    assert report.removed_artifacts == 0
+
+
+def test_collect_garbage_enforces_the_byte_budget(session, tmp_path, user):
+    jobs = [_make_build(session, tmp_path, user, f"key-{i}") for i in range(3)]
+    cache = ArtifactCache(tmp_path / ARTIFACTS_DIR)
+    for i, job in enumerate(jobs):
+        os.utime(cache.root / f"key-{i}" / SIZE_FILE, (i, i))
+
+    report = collect_garbage(tmp_path, keep=5, quota=15)
+
+    assert report.removed_artifacts == 2
+    assert [key for key, *_ in cache.artifacts()] == ["key-2"]
+    assert [job.is_expired for job in jobs] == [True, True, False]
+
+
+def test_collect_garbage_removes_leftovers(session, tmp_path, user):
+    stale_output = tmp_path / user.username_lower / "tmpabc-test-output"
+    stale_output.mkdir(parents=True)
+    recent_output = tmp_path / user.username_lower / "tmpdef-test-output"
+    recent_output.mkdir()
+    stale_temp = tmp_path / ARTIFACTS_DIR / ".tmp-abc"
+    stale_temp.mkdir(parents=True)
+    for path in (stale_output, stale_temp):
+        os.utime(path, _long_ago())
+
+    report = collect_garbage(tmp_path, keep=5)
+
+    assert report.removed_leftovers == 2
+    assert not stale_output.exists()
+    assert not stale_temp.exists()
+    assert recent_output.exists()
+
+
+def test_collect_garbage_removes_leftovers_in_the_scratch_folder(
+    session, tmp_path, user
+):
+    scratch = tmp_path / "scratch"
+    stale_output = scratch / user.username_lower / "tmpabc-test-output"
+    stale_output.mkdir(parents=True)
+    os.utime(stale_output, _long_ago())
+
+    report = collect_garbage(tmp_path / "builds", keep=5, scratch=scratch)
+
+    assert report.removed_leftovers == 1
+    assert not stale_output.exists()
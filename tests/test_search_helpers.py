@@ -0,0 +1,123 @@
+from app import db, models
+from app.helpers import search
+from app.helpers.search import search_articles
+
+
+def _search(user, query, limit=10):
+    return search_articles(user.id, query, limit=limit)
+
+
+def _ids(results):
+    return [result.article_id for result in results]
+
+
+def _make_article(session, user, **kwargs):
+    kwargs.setdefault("content", "Content")
+    article = models.Article(user=user, **kwargs)
+    session.add(article)
+    session.commit()
+    return article
+
+
+def test_search_articles(session, user):
+    article = _make_article(session, user, title="Flask", content="Use blueprints")
+    _make_article(session, user, title="Django", content="Use apps")
+
+    assert _ids(_search(user, "blueprints")) == [article.id]
+    assert _ids(_search(user, "flask")) == [article.id]
+    # every word has to match
+    assert _search(user, "blueprints apps") == []
+
+
+def test_search_articles_by_prefix(session, user):
+    article = _make_article(session, user, title="Flask", content="Use blueprints")
+
+    assert _ids(_search(user, "bluep")) == [article.id]
+
+
+def test_search_articles_by_summary_and_keywords(session, user):
+    by_summary = _make_article(session, user, title="One", summary="About pelican")
+    by_keyword = _make_article(session, user, title="Two")
+    by_keyword.data.append(models.ArticleData(key="keyword", value="pelican"))
+    session.commit()
+
+    assert set(_ids(_search(user, "pelican"))) == {by_summary.id, by_keyword.id}
+
+
+def test_search_articles_ranks_the_title_first(session, user):
+    in_content = _make_article(session, user, title="One", content="About pelican")
+    in_title = _make_article(session, user, title="Pelican", content="About it")
+
+    assert _ids(_search(user, "pelican")) == [in_title.id, in_content.id]
+
+
+def test_search_articles_limit(session, user):
+    for i in range(3):
+        _make_article(session, user, title=f"Pelican {i}")
+
+    assert len(_search(user, "pelican", limit=2)) == 2
+
+
+def test_search_articles_of_the_user_only(session, user):
+    other_user = models.User(username="other", email="other@example.com")
+    session.add(other_user)
+    session.commit()
+    _make_article(session, other_user, title="Pelican")
+
+    assert _search(user, "pelican") == []
+
+
+def test_search_articles_ignores_the_query_syntax(session, user):
+    article = _make_article(session, user, title="Pelican")
+
+    assert _search(user, '"') == []
+    assert _ids(_search(user, 'pelican" OR')) == []
+    assert _ids(_search(user, "pelican*")) == [article.id]
+
+
+def test_search_articles_snippets_are_escaped(session, user):
+    _make_article(session, user, title="One", content="Some <b>pelican</b> here")
+
+    (result,) = _search(user, "pelican")
+
+    assert result.snippet == "Some &lt;b&gt;<mark>pelican</mark>&lt;/b&gt; here"
+
+
+def test_search_index_follows_the_articles(session, user):
+    article = _make_article(session, user, title="One", content="About pelican")
+
+    article.content = "About jinja"
+    session.commit()
+    assert _search(user, "pelican") == []
+    assert _ids(_search(user, "jinja")) == [article.id]
+
+    session.delete(article)
+    session.commit()
+    assert _search(user, "jinja") == []
+
+
+def test_search_index_follows_the_keywords(session, user):
+    article = _make_article(session, user, title="One")
+    keyword = models.ArticleData(key="keyword", value="pelican")
+    article.data.append(keyword)
+    session.commit()
+
+    keyword.value = "jinja"
+    session.commit()
+    assert _search(user, "pelican") == []
+    assert _ids(_search(user, "jinja")) == [article.id]
+
+    session.delete(keyword)
+    session.commit()
+    assert _search(user, "jinja") == []
+
+
+def test_index_articles_rebuilds_the_index(session, user):
+    article = _make_article(session, user, title="Pelican")
+    # as if the index was lost
+    session.execute(db.text("DELETE FROM articles_fts"))
+    assert _search(user, "pelican") == []
+
+    search.index_articles(session.connection())
+
+    assert _ids(_search(user, "pelican")) == [article.id]
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+import pytest
+from pelican import read_settings
+
+from app.helpers import settings as sh
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    sh.clear_settings_cache()
+    yield
+    sh.clear_settings_cache()
+
+
+def test_settings_snapshot_matches_pelican_settings():
+    settings = read_settings()
+    snapshot = sh.settings_snapshot()
+
+    assert snapshot.keys() == settings.keys()
+    assert snapshot["SITENAME"] == settings["SITENAME"]
+    assert dict(snapshot["MARKDOWN"]["extension_configs"]) == {
+        name: dict(config)
+        for name, config in settings["MARKDOWN"]["extension_configs"].items()
+    }
+
+
+def test_settings_are_only_read_once():
+    with patch("app.helpers.settings.read_settings", wraps=read_settings) as mock:
+        for _ in range(5):
+            sh.settings_snapshot()
+            sh.pelican_settings()
+
+    assert mock.call_count == 1
+
+
+def test_settings_snapshot_is_read_only():
+    snapshot = sh.settings_snapshot()
+    with pytest.raises(TypeError):
+        snapshot["SITENAME"] = "Changed"
+
+
+def test_pelican_settings_gives_independent_copies():
+    settings = sh.pelican_settings()
+    settings["SITENAME"] = "Changed"
+    settings["MARKDOWN"]["output_format"] = "xhtml"
+
+    snapshot = sh.settings_snapshot()
+    assert snapshot["SITENAME"] != "Changed"
+    assert snapshot["MARKDOWN"]["output_format"] != "xhtml"
+
+
+def test_settings_snapshot_is_read_only_all_the_way_down():
+    snapshot = sh.settings_snapshot()
+
+    with pytest.raises(TypeError):
+        snapshot["MARKDOWN"]["output_format"] = "xhtml"
+    with pytest.raises(TypeError):
+        snapshot["JINJA_ENVIRONMENT"]["trim_blocks"] = False
+    with pytest.raises(AttributeError):
+        snapshot["PLUGIN_PATHS"].append("plugins")
+    assert sh.pelican_settings()["MARKDOWN"] == read_settings()["MARKDOWN"]
+
+
+def test_settings_are_cached_by_override():
+    override = {"SITENAME": "My Site"}
+    assert sh.settings_snapshot(override=override)["SITENAME"] == "My Site"
+    assert sh.settings_snapshot()["SITENAME"] != "My Site"
+    # the overrides aren't changed by reading the settings
+    assert override == {"SITENAME": "My Site"}
+
+
+def test_settings_are_cached_by_path(tmp_path):
+    settings_file = tmp_path / "pelicanconf.py"
+    settings_file.write_text("SITENAME = 'From File'\n")
+
+    assert sh.settings_snapshot(path=settings_file)["SITENAME"] == "From File"
+    assert sh.settings_snapshot()["SITENAME"] != "From File"
@@ -0,0 +1,62 @@
+import pickle
+
+import pytest
+
+from app import models
+from app.main.snapshot import ArticleDatum, ArticleSnapshot, as_snapshot
+
+
+@pytest.fixture
+def snapshot(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    article.data = [models.ArticleData(key="keywords", value="test")]
+    session.add(article)
+    session.commit()
+    return ArticleSnapshot.from_article(article)
+
+
+def test_snapshot_from_article(snapshot, user):
+    assert snapshot.title == "Title"
+    assert snapshot.content == "Content"
+    assert snapshot.author == user.username
+    assert snapshot.username_lower == user.username_lower
+    assert snapshot.data == (ArticleDatum("keywords", "test"),)
+    assert snapshot.data[0].key == "keywords"
+
+
+def test_snapshot_with_the_cached_html(session, user):
+    article = models.Article(title="Title", content="Content", user=user)
+    session.add(article)
+    session.commit()
+
+    assert ArticleSnapshot.from_article(article).rendered_html is None
+    snapshot = ArticleSnapshot.from_article(article, include_html=True)
+    assert snapshot.rendered_html == "<p>Content</p>\n"
+
+    article.rendered_fingerprint = "stale"
+    snapshot = ArticleSnapshot.from_article(article, include_html=True)
+    assert snapshot.rendered_html is None
+
+
+def test_snapshot_is_immutable(snapshot):
+    with pytest.raises(AttributeError):
+        snapshot.title = "New title"
+    with pytest.raises(AttributeError):
+        del snapshot.title
+    with pytest.raises(AttributeError):
+        snapshot.extra = "extra"
+
+
+def test_snapshot_has_no_instance_dict(snapshot):
+    assert not hasattr(snapshot, "__dict__")
+
+
+def test_snapshot_can_be_pickled(snapshot):
+    copy = pickle.loads(pickle.dumps(snapshot))
+    assert copy == snapshot
+    assert hash(copy) == hash(snapshot)
+
+
+def test_as_snapshot(article, snapshot):
+    assert as_snapshot(snapshot) is snapshot
+    assert as_snapshot(article) == ArticleSnapshot.from_article(article)
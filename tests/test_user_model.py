@@ -1,5 +1,6 @@
 from time import sleep
 
+from app import db
 from app.helpers import users as uh
 from app.models import Article, User, load_user
 
@@ -132,6 +133,71 @@ def test_num_published():
     assert user.num_published == 1  # Expect 1 published article
 
 
+def _counts(session, user_id):
+    session.expire_all()
+    user = session.get(User, user_id)
+    return user.article_count, user.draft_count, user.published_count
+
+
+def test_article_counters(session, user):
+    updated_at = user.updated_at
+    user_id = user.id
+    drafts = [Article(title="Draft", content="Content", user=user) for _ in range(2)]
+    published = Article(title="Published", content="Content", user=user)
+    published.is_draft = False
+    session.add_all([*drafts, published])
+    session.commit()
+
+    assert _counts(session, user_id) == (3, 2, 1)
+
+    drafts[0].is_draft = False
+    session.commit()
+    assert _counts(session, user_id) == (3, 1, 2)
+
+    session.delete(drafts[1])
+    session.commit()
+    assert _counts(session, user_id) == (2, 0, 2)
+    # counting isn't an update of the user
+    assert session.get(User, user_id).updated_at == updated_at
+
+
+def test_article_counters_when_an_article_changes_users(session, user):
+    other_user = User(username="other", email="other@example.com")
+    article = Article(title="Title", content="Content", user=user)
+    session.add_all([other_user, article])
+    session.commit()
+    user_id, other_user_id = user.id, other_user.id
+
+    article.user = other_user
+    session.commit()
+
+    assert _counts(session, user_id) == (0, 0, 0)
+    assert _counts(session, other_user_id) == (1, 1, 0)
+
+
+def test_article_counts_dont_load_the_articles(session, user):
+    session.add(Article(title="Title", content="Content", user=user))
+    session.commit()
+    session.expire_all()
+    user = session.get(User, user.id)
+
+    assert (user.num_articles, user.num_drafts, user.num_published) == (1, 1, 0)
+    assert "articles" in db.inspect(user).unloaded
+
+
+def test_recount_articles(session, user):
+    user_id = user.id
+    session.add(Article(title="Title", content="Content", user=user))
+    session.commit()
+    session.execute(db.update(User).values(article_count=5, draft_count=5))
+    session.commit()
+
+    User.recount_articles()
+    session.commit()
+
+    assert _counts(session, user_id) == (1, 1, 0)
+
+
 def test_get_reset_password_token(session):
     user = session.get(User, 1)
 